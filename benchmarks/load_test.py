@@ -0,0 +1,105 @@
+"""Mixed concurrent traffic against a running server, reporting latency percentiles.
+
+Run once against a server from before a change and once after, e.g.
+
+    export $(grep -v '^#' .env | xargs)
+    python benchmarks/load_test.py --concurrency 64 --duration 30 \
+        /ark:57802/2021/11/marda/phonons \
+        /ark:57802/2021/11/marda/phonons/material_id \
+        /ark:57802/fk1234 \
+        /ark:57802/dw0/agu/0200
+
+Each worker repeatedly picks the next path (round-robin) and a random Accept
+header from `ACCEPTS`, so slow serializations and fast lookups are interleaved
+the way they are in production.
+"""
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import typer
+
+from xyz_polyneme_ns.util import HOST
+
+ACCEPTS = [
+    "application/ld+json",
+    "text/turtle",
+    "application/rdf+xml",
+    "text/html",
+]
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    paths: List[str],
+    deadline: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, int],
+):
+    i = random.randrange(len(paths))
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            rv = await client.get(path, headers={"Accept": random.choice(ACCEPTS)})
+            if rv.status_code >= 500:
+                errors[path] += 1
+        except httpx.HTTPError:
+            errors[path] += 1
+        latencies[path].append(time.perf_counter() - t0)
+
+
+async def run(host: str, paths: List[str], concurrency: int, duration: float):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=host, limits=limits, timeout=60, follow_redirects=False
+    ) as client:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *(
+                worker(client, paths, deadline, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+    return latencies, errors
+
+
+def report(latencies: Dict[str, List[float]], errors: Dict[str, int], duration: float):
+    rows = list(latencies.items()) + [
+        ("ALL", [t for ts in latencies.values() for t in ts])
+    ]
+    typer.echo(f"{'path':<60} {'n':>7} {'err':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for path, ts in rows:
+        n_err = sum(errors.values()) if path == "ALL" else errors[path]
+        typer.echo(
+            f"{path:<60} {len(ts):>7} {n_err:>5} "
+            f"{1000 * statistics.median(ts):>8.1f} {1000 * percentile(ts, 99):>8.1f}"
+        )
+    n_total = len(rows[-1][1])
+    typer.echo(f"throughput: {n_total / duration:.1f} req/s")
+
+
+def main(
+    paths: List[str],
+    host: str = typer.Option(HOST or "http://localhost:8000"),
+    concurrency: int = 32,
+    duration: float = 20.0,
+):
+    latencies, errors = asyncio.run(run(host, paths, concurrency, duration))
+    report(latencies, errors, duration)
+
+
+if __name__ == "__main__":
+    typer.run(main)
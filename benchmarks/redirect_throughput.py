@@ -0,0 +1,88 @@
+"""Redirects per second that one worker can serve, in-process (no network, no Mongo).
+
+    python benchmarks/redirect_throughput.py --n-arks 100000 --requests 200000
+
+ARKs from `ark_map.csv` (or `--n-arks` synthetic ones) are put in the redirect
+index, and the app is called directly as an ASGI app, cycling over redirect ARKs,
+`ark:/` spellings of them, and shoulder forwards. This measures the cost of the
+fast path itself; use `load_test.py` to measure a deployed server.
+"""
+import asyncio
+import csv
+import time
+from typing import List
+
+import typer
+
+from xyz_polyneme_ns.main import API_HOST, app
+from xyz_polyneme_ns.redirects import redirect_index, shoulder_forwards
+from xyz_polyneme_ns.util import REPO_ROOT_DIR
+
+
+def load_arks(n_arks: int) -> List[str]:
+    path = REPO_ROOT_DIR.joinpath("ark_map.csv")
+    if path.exists():
+        with open(path) as csvfile:
+            redirects = [(row["ark"], row["url"]) for row in csv.DictReader(csvfile)]
+    else:
+        redirects = []
+    redirects += [
+        (f"ark:57802/fk1bench{i}", f"https://example.org/{i}")
+        for i in range(n_arks - len(redirects))
+    ]
+    redirect_index.put_many(redirects)
+    return [ark for ark, _ in redirects]
+
+
+def scope_for(path: str) -> dict:
+    scheme, _, host = (API_HOST or "http://testserver").partition("://")
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": scheme,
+        "server": (host, 80),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", host.encode())],
+    }
+
+
+async def run(paths: List[str], n_requests: int) -> dict:
+    statuses = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses[message["status"]] = statuses.get(message["status"], 0) + 1
+
+    scopes = [scope_for(p) for p in paths]
+    started = time.perf_counter()
+    for i in range(n_requests):
+        await app(dict(scopes[i % len(scopes)]), receive, send)
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "statuses": statuses}
+
+
+def main(
+    n_arks: int = typer.Option(10_000, help="redirect ARKs to index"),
+    n_requests: int = typer.Option(100_000, "--requests"),
+):
+    arks = load_arks(n_arks)
+    paths = [f"/{ark}" for ark in arks[:1000]]
+    paths += [p.replace("/ark:", "/ark:/", 1) for p in paths[:100]]
+    paths += [f"{prefix}bench" for prefix in shoulder_forwards]
+    result = asyncio.run(run(paths, n_requests))
+    typer.echo(
+        f"{n_requests} requests in {result['elapsed']:.2f}s: "
+        f"{n_requests / result['elapsed']:.0f} redirects/sec "
+        f"(statuses: {result['statuses']})"
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
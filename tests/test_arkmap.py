@@ -0,0 +1,39 @@
+import csv
+
+from xyz_polyneme_ns.arkmap import acquire_load_lock, load_ark_map
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.redirects import RedirectIndex
+
+
+def write_ark_map(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ark", "url"])
+        writer.writerows(rows)
+
+
+def test_load_ark_map_writes_only_changes(tmp_path):
+    mdb = mongo_db()
+    path = tmp_path.joinpath("test_ark_map.csv")
+    arks = [f"ark:57802/fk1loadtest{i}" for i in range(5)]
+    rows = [(ark, f"https://example.org/{i}") for i, ark in enumerate(arks)]
+    try:
+        write_ark_map(path, rows)
+        index = RedirectIndex()
+        assert load_ark_map(mdb, path, index=index, batch_size=2) == 5
+        assert index.get(arks[0]) == "https://example.org/0"
+        assert load_ark_map(mdb, path) is None  # unchanged file
+
+        rows[3] = (arks[3], "https://example.com/3")
+        write_ark_map(path, rows)
+        assert load_ark_map(mdb, path, batch_size=2) == 1
+        assert mdb.arks.find_one({"_id": arks[3]})["_t"] == "https://example.com/3"
+
+        rows.append(("ark:57802/fk1loadtest5", "https://example.org/5"))
+        arks.append(rows[-1][0])
+        write_ark_map(path, rows)
+        assert acquire_load_lock(mdb, path.name)
+        assert load_ark_map(mdb, path) is None  # another worker is loading
+    finally:
+        mdb.arks.delete_many({"_id": {"$in": arks}})
+        mdb.file_loads.delete_one({"_id": path.name})
@@ -0,0 +1,98 @@
+from xyz_polyneme_ns.arkpool import (
+    claim_ark,
+    pool_depth,
+    pool_key,
+    pooled_shoulders,
+    refill_pool,
+    refill_pools,
+)
+from xyz_polyneme_ns.db import acquire_lease, mongo_db, release_lease
+from xyz_polyneme_ns.util import NAAN
+
+
+def test_refill_and_claim():
+    mdb = mongo_db()
+    naan, shoulder = int(NAAN), "fkfkfkfk4"
+    key = pool_key(naan, shoulder)
+    try:
+        doc = {"rdfs:label": "$not an expression"}
+        assert claim_ark(mdb, naan, shoulder, doc, "http://example.org/") is None
+        assert refill_pool(mdb, naan, shoulder, size=10, low_water=5, batch=4) == 10
+        assert pool_depth(mdb, naan, shoulder) == 10
+
+        stored = claim_ark(mdb, naan, shoulder, doc, "http://example.org/")
+        assert stored["_id"].startswith(key)
+        assert stored["@id"] == f"http://example.org/{stored['_id']}"
+        assert mdb.arks.find_one({"_id": stored["_id"]}) == stored
+        assert stored["rdfs:label"] == doc["rdfs:label"]
+        assert "_pool" not in stored
+        assert pool_depth(mdb, naan, shoulder) == 9
+
+        # above the low-water mark, so no refill
+        assert refill_pool(mdb, naan, shoulder, size=10, low_water=5, batch=4) == 9
+    finally:
+        mdb.arks.delete_many({"_id": {"$regex": rf"^{key}"}})
+        mdb.ark_counters.delete_one({"_id": key})
+
+
+def test_fresh_shoulder_pool_gets_short_blades():
+    mdb = mongo_db()
+    naan, shoulder = int(NAAN), "fkfkfkfk5"
+    key = pool_key(naan, shoulder)
+    try:
+        refill_pool(mdb, naan, shoulder, size=10, low_water=5, batch=10)
+        blades = [d["_id"][len(key) :] for d in mdb.arks.find({"_pool": key})]
+        assert blades and all(len(b) == 4 for b in blades)  # 2 chars + checksum
+    finally:
+        mdb.arks.delete_many({"_id": {"$regex": rf"^{key}"}})
+        mdb.ark_counters.delete_one({"_id": key})
+
+
+def test_only_shoulders_in_use_are_pooled():
+    mdb = mongo_db()
+    naan = int(NAAN)
+    mdb.naans.update_one(
+        {"_id": naan}, {"$addToSet": {"shoulders": "fkfkfkfk6"}}, upsert=True
+    )
+    try:
+        assert (naan, "fkfkfkfk6") not in set(pooled_shoulders(mdb))
+        mdb.ark_counters.insert_one({"_id": pool_key(naan, "fkfkfkfk6"), "n": 1})
+        assert (naan, "fkfkfkfk6") in set(pooled_shoulders(mdb))
+    finally:
+        mdb.naans.update_one({"_id": naan}, {"$pull": {"shoulders": "fkfkfkfk6"}})
+        mdb.ark_counters.delete_one({"_id": pool_key(naan, "fkfkfkfk6")})
+
+
+def test_claim_skips_docs_that_have_an_id():
+    mdb = mongo_db()
+    naan, shoulder = int(NAAN), "fkfkfkfk4"
+    key = pool_key(naan, shoulder)
+    skolem = {"_id": f"{key}live", "@id": f"http://example.org/{key}live", "_pool": key}
+    try:
+        mdb.arks.insert_one(skolem)
+        assert claim_ark(mdb, naan, shoulder, {}, "http://example.org/") is None
+        assert mdb.arks.find_one({"_id": skolem["_id"]}) == skolem
+    finally:
+        mdb.arks.delete_many({"_id": {"$regex": rf"^{key}"}})
+
+
+def test_one_worker_at_a_time_refills():
+    mdb = mongo_db()
+    naan, shoulder = int(NAAN), "fkfkfkfk7"
+    key = pool_key(naan, shoulder)
+    mdb.naans.update_one(
+        {"_id": naan}, {"$addToSet": {"shoulders": shoulder}}, upsert=True
+    )
+    mdb.ark_counters.insert_one({"_id": key, "n": 1})
+    owner = acquire_lease(mdb, "ark_pools", 60)  # as if another worker refills
+    try:
+        refill_pools(mdb)
+        assert pool_depth(mdb, naan, shoulder) == 0
+        release_lease(mdb, "ark_pools", owner)
+        refill_pools(mdb)
+        assert pool_depth(mdb, naan, shoulder) > 0
+    finally:
+        release_lease(mdb, "ark_pools", owner)
+        mdb.naans.update_one({"_id": naan}, {"$pull": {"shoulders": shoulder}})
+        mdb.arks.delete_many({"_id": {"$regex": rf"^{key}"}})
+        mdb.ark_counters.delete_one({"_id": key})
@@ -0,0 +1,119 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasicCredentials
+
+from xyz_polyneme_ns import auth
+from xyz_polyneme_ns.auth import (
+    authenticate_agent,
+    create_access_token,
+    get_current_agent,
+    get_password_hash,
+    verified_credentials,
+)
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.models import get_agent_uri
+from xyz_polyneme_ns.util import NAAN
+
+
+@pytest.fixture(autouse=True)
+def jwt_secret_key(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET_KEY", "test-secret")
+
+
+@pytest.fixture
+def agent_credentials():
+    mdb = mongo_db()
+    naan, username, password = int(NAAN), "test_auth_agent", "s3cret-Passw0rd"
+    agent_uri = get_agent_uri(naan, username)
+    mdb.agents.insert_one(
+        {
+            "id": agent_uri,
+            "username": username,
+            "hashed_password": get_password_hash(password),
+            "can_admin_shoulders": [],
+            "can_edit": [],
+            "can_admin": [],
+            "type": "software_agent",
+        }
+    )
+    yield naan, username, password
+    mdb.agents.delete_one({"id": agent_uri})
+
+
+def test_verified_credentials_are_cached(agent_credentials):
+    naan, username, password = agent_credentials
+    verified_credentials.clear()
+
+    creds = HTTPBasicCredentials(username=username, password=password)
+    assert get_current_agent(naan, creds, None).username == username
+    assert len(verified_credentials) == 1
+    assert get_current_agent(naan, creds, None).username == username
+
+    with pytest.raises(HTTPException):
+        get_current_agent(
+            naan, HTTPBasicCredentials(username=username, password="wrong"), None
+        )
+
+
+def test_password_change_invalidates_cache(agent_credentials):
+    naan, username, password = agent_credentials
+    creds = HTTPBasicCredentials(username=username, password=password)
+    get_current_agent(naan, creds, None)
+
+    mongo_db().agents.update_one(
+        {"id": get_agent_uri(naan, username)},
+        {"$set": {"hashed_password": get_password_hash("another-Passw0rd")}},
+    )
+    with pytest.raises(HTTPException):
+        get_current_agent(naan, creds, None)
+
+
+def test_token_authorizes_without_db(agent_credentials):
+    naan, username, password = agent_credentials
+    agent = authenticate_agent(
+        naan, HTTPBasicCredentials(username=username, password=password)
+    )
+    token = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token(naan, agent)
+    )
+
+    mongo_db().agents.delete_one({"id": agent.id})
+    token_agent = get_current_agent(naan, None, token)
+    assert token_agent.id == agent.id
+    assert token_agent.can_admin_shoulders == agent.can_admin_shoulders
+
+    with pytest.raises(HTTPException):
+        get_current_agent(naan + 1, None, token)
+
+
+def test_expired_or_forged_token_is_rejected(agent_credentials):
+    naan, username, password = agent_credentials
+    agent = authenticate_agent(
+        naan, HTTPBasicCredentials(username=username, password=password)
+    )
+    expired = create_access_token(naan, agent, expires_minutes=-1)
+    forged = create_access_token(naan, agent)[:-2] + "xx"
+    for bad in (expired, forged):
+        with pytest.raises(HTTPException):
+            get_current_agent(
+                naan,
+                None,
+                HTTPAuthorizationCredentials(scheme="Bearer", credentials=bad),
+            )
+
+
+def test_no_tokens_without_a_key(agent_credentials, monkeypatch):
+    naan, username, password = agent_credentials
+    agent = authenticate_agent(
+        naan, HTTPBasicCredentials(username=username, password=password)
+    )
+    token = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token(naan, agent)
+    )
+    monkeypatch.setattr(auth, "JWT_SECRET_KEY", None)
+    with pytest.raises(HTTPException) as e:
+        create_access_token(naan, agent)
+    assert e.value.status_code == 501
+    with pytest.raises(HTTPException) as e:
+        get_current_agent(naan, None, token)
+    assert e.value.status_code == 401
@@ -0,0 +1,51 @@
+from xyz_polyneme_ns.cache import (
+    MISSING,
+    ResponseCache,
+    TTLCache,
+    etag_matches,
+    make_etag,
+    not_modified,
+)
+
+
+def test_etag_matches():
+    etag = make_etag(b"hello")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"nope", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"nope"', etag)
+
+
+def test_response_cache_invalidates_on_new_version():
+    cache = ResponseCache()
+    assert cache.get("r", "v1", "text/turtle") is MISSING
+    entry = cache.put("r", "v1", "text/turtle", body=b"ttl")
+    assert cache.get("r", "v1", "text/turtle") == entry
+    cache.put("r", "v1", "image/png", body=None)
+    assert cache.get("r", "v1", "image/png") is None
+    assert cache.get("r", "v2", "text/turtle") is MISSING
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.ttl = -1
+    cache.set("d", 4)
+    assert cache.get("d") is None
+
+
+def test_not_modified():
+    headers = {"ETag": '"abc"', "Last-Modified": "Sun, 18 Oct 2026 02:27:06 GMT"}
+    assert not_modified(headers, '"abc"')
+    assert not not_modified(headers, '"xyz"', "Mon, 19 Oct 2026 00:00:00 GMT")
+    assert not_modified(headers, None, "Sun, 18 Oct 2026 02:27:06 GMT")
+    assert not not_modified(headers, None, "Sat, 17 Oct 2026 00:00:00 GMT")
+    assert not not_modified(headers, None, "not a date")
+    assert not not_modified({"ETag": '"abc"'}, None, "Mon, 19 Oct 2026 00:00:00 GMT")
@@ -7,6 +7,7 @@ from typing import List
 import click.testing
 from typer.testing import CliRunner
 
+from xyz_polyneme_ns.cli import util as cli_util
 from xyz_polyneme_ns.cli.main import app
 from xyz_polyneme_ns.db import mongo_db
 from xyz_polyneme_ns.util import now, REPO_ROOT_DIR
@@ -68,6 +69,30 @@ def test_crud_skolem():
     mdb.arks.delete_one({"@id": doc_c["@id"]})
 
 
+def test_create_many_skolems():
+    result = cli_invoke(
+        [
+            "skolem",
+            "create-many",
+            "fk1",
+            "-f",
+            TESTS_DIR.joinpath("skolem_create_many.jsonl"),
+            "--chunk-size",
+            "2",
+        ]
+    )
+    assert result.exit_code == 0
+    rvs = [json.loads(line) for line in result.stdout.splitlines()]
+    ids = [id_ for rv in rvs for id_ in rv["ids"]]
+    try:
+        assert [rv["n_created"] for rv in rvs] == [2, 1]
+        assert all("fk1" in id_ for id_ in ids)
+        assert set(rvs[0]["mapping"]) == {"_:a", "_:b"}
+    finally:
+        mdb = mongo_db()
+        mdb.arks.delete_many({"@id": {"$in": ids}})
+
+
 def _ns_create():
     dt = now()
     test_org = f"/{dt.year}/{dt.month:02}/testorg"
@@ -163,6 +188,39 @@ def test_crud_term():
         _ns_delete(ns_doc_c["@id"])
 
 
+def test_import_and_export_terms(tmp_path):
+    ns_doc_c, test_repo = _ns_create()
+    try:
+        # relative IRIs in the Turtle file resolve against the namespace
+        ttl = TESTS_DIR.joinpath("terms_import.ttl").read_text()
+        ttl_file = tmp_path.joinpath("terms.ttl")
+        ttl_file.write_text(f"@base <{ns_doc_c['@id']}/> .\n{ttl}")
+
+        result = cli_invoke(["term", "import-file", test_repo, "-f", str(ttl_file)])
+        rv = json.loads(result.stdout)
+        assert rv["n_created"] == 2
+        assert rv["conflicts"] == []
+
+        result = cli_invoke(["term", "import-file", test_repo, "-f", str(ttl_file)])
+        rv = json.loads(result.stdout)
+        assert rv["n_created"] == 0
+        assert len(rv["conflicts"]) == 2
+
+        export_file = tmp_path.joinpath("export.jsonl")
+        result = cli_invoke(["ns", "export", test_repo, "-o", str(export_file)])
+        assert result.exit_code == 0
+        docs = [json.loads(line) for line in export_file.read_text().splitlines()]
+        assert docs[0]["@id"] == ns_doc_c["@id"]
+        assert {d["rdfs:label"] for d in docs[1:]} == {
+            "Imported Term 1",
+            "Imported Term 2",
+        }
+    finally:
+        mdb = mongo_db()
+        mdb.terms.delete_many({"@id": {"$regex": rf"^{ns_doc_c['@id']}/"}})
+        _ns_delete(ns_doc_c["@id"])
+
+
 def test_cannot_create_past_namespace():
     result = cli_invoke(
         [
@@ -205,3 +263,30 @@ def test_update_missing_dollar_op():
         assert "update only works with $ operators" in doc_err["detail"]
     finally:
         _ns_delete(ns_doc_c["@id"])
+
+
+def test_token_is_kept_between_runs(monkeypatch, tmp_path):
+    class Token:
+        status_code = 200
+
+        def json(self):
+            return {"access_token": "t0k3n", "expires_in": 3600}
+
+    posts = []
+
+    def request(method, url, **kwargs):
+        posts.append(url)
+        return Token()
+
+    monkeypatch.setattr(cli_util, "request", request)
+    monkeypatch.setattr(cli_util, "TOKEN_FILE", tmp_path.joinpath("tokens.json"))
+    monkeypatch.setitem(cli_util._no_tokens, "declined", False)
+    assert cli_util.access_token() == "t0k3n"
+    assert cli_util.access_token() == "t0k3n"  # e.g. in the next `termeric` run
+    assert len(posts) == 1
+    assert "t0k3n" in tmp_path.joinpath("tokens.json").read_text()
+
+    Token.status_code = 404  # a server without the token route
+    assert cli_util.access_token(refresh=True) is None
+    assert cli_util.access_token(refresh=True) is None
+    assert len(posts) == 2
@@ -0,0 +1,50 @@
+from xyz_polyneme_ns.db import (
+    acquire_lease,
+    ensure_unique_index,
+    id_prefix_filter,
+    mongo_db,
+    release_lease,
+    renew_lease,
+)
+
+
+def test_id_prefix_filter():
+    f = id_prefix_filter("https://ns.polyneme.xyz/ark:57802/2021/11/marda/phonons/")
+    bounds = f["@id"]
+    inside = "https://ns.polyneme.xyz/ark:57802/2021/11/marda/phonons/material_id"
+    sibling = "https://ns.polyneme.xyz/ark:57802/2021/11/marda/phonons2/material_id"
+    assert bounds["$gte"] <= inside < bounds["$lt"]
+    assert not (bounds["$gte"] <= sibling < bounds["$lt"])
+
+
+def test_ensure_unique_index_replaces_non_unique_index():
+    collection = mongo_db().test_ensure_unique_index
+    try:
+        collection.create_index("@id")
+        collection.insert_many([{"@id": "a"}, {"@id": "a"}])
+        ensure_unique_index(collection, "@id")  # duplicates: stays non-unique
+        assert not collection.index_information()["@id_1"].get("unique")
+
+        collection.delete_one({"@id": "a"})
+        ensure_unique_index(collection, "@id")
+        assert collection.index_information()["@id_1"].get("unique")
+    finally:
+        collection.drop()
+
+
+def test_lease_is_only_released_by_its_holder():
+    mdb = mongo_db()
+    try:
+        owner = acquire_lease(mdb, "test_lease", 60)
+        assert owner and acquire_lease(mdb, "test_lease", 60) is None
+        release_lease(mdb, "test_lease", owner)
+
+        stale = acquire_lease(mdb, "test_lease", -1)  # as if it ran out
+        owner = acquire_lease(mdb, "test_lease", 60)
+        assert owner and owner != stale
+        assert not renew_lease(mdb, "test_lease", stale, 60)
+        release_lease(mdb, "test_lease", stale)
+        assert acquire_lease(mdb, "test_lease", 60) is None
+        assert renew_lease(mdb, "test_lease", owner, 60)
+    finally:
+        mdb.leases.delete_one({"_id": "test_lease"})
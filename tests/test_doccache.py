@@ -0,0 +1,89 @@
+import struct
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.doccache import CachedBody, DocCache
+
+
+def test_doc_cache_is_bounded_in_bytes():
+    cache = DocCache(max_bytes=120)
+    a, b = {"@id": "a", "x": "a" * 30}, {"@id": "b", "x": "b" * 30}
+    cache.put("a", a)
+    cache.put("b", b)
+    assert cache.get("a") is a and cache.get("b") is b
+    cache.put_body("a", a, "text/turtle", CachedBody(b"a" * 40, "text/turtle"))
+    assert cache.get("b") is None  # evicted to make room for a's body
+    assert cache.body("a", a, "text/turtle").body == b"a" * 40
+    assert cache.size <= 120
+
+
+def test_doc_cache_skips_loads_that_race_an_invalidation():
+    cache = DocCache()
+
+    def load():
+        cache.discard("t")  # a write lands while the doc is being loaded
+        return {"@id": "t"}
+
+    assert cache.get_or_load("t", load) == {"@id": "t"}
+    assert cache.get("t") is None
+    assert cache.get_or_load("t", lambda: {"@id": "t"}) is cache.get("t")
+
+
+def test_doc_cache_invalidate_is_recorded_for_other_workers():
+    mdb = mongo_db()
+    cache = DocCache()
+    cache.put("ark:57802/fk1cachetest", {"@id": "x"})
+    cache.invalidate(mdb, "ark:57802/fk1cachetest")
+    try:
+        assert cache.get("ark:57802/fk1cachetest") is None
+        assert mdb.doc_cache_invalidations.find_one({"key": "ark:57802/fk1cachetest"})
+    finally:
+        mdb.doc_cache_invalidations.delete_many({"key": "ark:57802/fk1cachetest"})
+
+
+def test_doc_cache_discards_reach_listeners():
+    cache, discarded = DocCache(), []
+    cache.on_discard(discarded.append)
+    cache.discard("ark:57802/fk1redirect")  # e.g. applied from another worker
+    assert discarded == ["ark:57802/fk1redirect"]
+
+
+def test_polling_sees_invalidations_from_interleaved_writers():
+    mdb = mongo_db()
+    cache, seen = DocCache(), {}
+    since = datetime.now(tz=timezone.utc)
+    cache.put("ark:57802/fk1polla", {"@id": "a"})
+    cache.put("ark:57802/fk1pollb", {"@id": "b"})
+
+    def invalidation(key, process_bytes):
+        # An ObjectId as made by another process in this second: ids of
+        # different processes sort by their process bytes, not by time.
+        seconds = struct.pack(">I", int(since.timestamp()))
+        return {
+            "_id": ObjectId(seconds + process_bytes + b"\0\0\1"),
+            "key": key,
+            "at": datetime.now(tz=timezone.utc),
+        }
+
+    try:
+        mdb.doc_cache_invalidations.insert_one(
+            invalidation("ark:57802/fk1polla", b"\xff" * 5)
+        )
+        since = cache.poll_invalidations(mdb, since, seen)
+        assert cache.get("ark:57802/fk1polla") is None
+        assert cache.get("ark:57802/fk1pollb") is not None
+
+        # written later by a worker whose ids sort first
+        mdb.doc_cache_invalidations.insert_one(
+            invalidation("ark:57802/fk1pollb", b"\0" * 5)
+        )
+        generation = cache.generation
+        since = cache.poll_invalidations(mdb, since, seen)
+        assert cache.get("ark:57802/fk1pollb") is None
+        assert cache.generation == generation + 1  # a's isn't applied again
+    finally:
+        mdb.doc_cache_invalidations.delete_many(
+            {"key": {"$in": ["ark:57802/fk1polla", "ark:57802/fk1pollb"]}}
+        )
@@ -0,0 +1,24 @@
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.idgen import blade_length_runs, create_ark_bon
+from xyz_polyneme_ns.util import NAAN
+
+
+def test_create_ark_bon_counts_shoulder():
+    mdb = mongo_db()
+    naan, shoulder = int(NAAN), "fkfkfkfk4"
+    counter_id = f"ark:{naan}/{shoulder}"
+    bons = []
+    try:
+        for _ in range(3):
+            bons.append(create_ark_bon(mdb, naan=naan, shoulder=shoulder))
+        assert len(set(bons)) == 3
+        assert all(bon.startswith(counter_id) for bon in bons)
+        assert mdb.ark_counters.find_one({"_id": counter_id})["n"] == 3
+    finally:
+        mdb.arks.delete_many({"_id": {"$in": bons}})
+        mdb.ark_counters.delete_one({"_id": counter_id})
+
+
+def test_blade_length_runs_split_at_sping_thresholds():
+    assert blade_length_runs(1, 3) == [(2, 3)]
+    assert blade_length_runs(510, 514) == [(2, 2), (4, 3)]
@@ -1,12 +1,38 @@
+import json
+import time
+
+import pytest
+import requests
+from fastapi import HTTPException
+from rdflib import Graph, URIRef
+
 from starlette.responses import Response
 
+from xyz_polyneme_ns.cache import not_modified
 from xyz_polyneme_ns.db import mongo_db
 from xyz_polyneme_ns.main import (
+    API_HOST,
+    check_no_storage_fields,
+    doc_cache,
+    get_term,
+    import_term,
+    distribution_session,
+    doc_validators,
+    first_revision,
+    fetch_distribution_ttl,
     response_for,
     load_graph_from_file,
+    namespace_html_response,
     ensure_initial_resources_on_boot,
+    jsonld_doc_response,
+    term_cards_for,
+    update_doc_clearing_equivalences,
+    updated_fields,
+    validate_term_docs,
+    with_equivalences_unset,
 )
-from xyz_polyneme_ns.util import NAAN
+from xyz_polyneme_ns.models import Agent, TermImport
+from xyz_polyneme_ns.util import NAAN, now
 
 
 def test_no_extra_prefixes():
@@ -31,3 +57,220 @@ def test_no_clobbering_of_naan_shoulders_on_restart():
 
     assert fake_shoulder in mdb.naans.find_one({"_id": naan})["shoulders"]
     mdb.naans.update_one({"_id": naan}, {"$pull": {"shoulders": fake_shoulder}})
+
+
+def test_jsonld_doc_response_fast_path():
+    doc = {
+        "_id": "whatever",
+        "@id": "http://example.org/t",
+        "rdfs:label": "T",
+        "@context": {"ex": "http://example.org/"},
+    }
+    rv: Response = jsonld_doc_response(doc, "application/ld+json")
+    assert rv.media_type == "application/ld+json"
+    served = json.loads(rv.body)
+    assert "_id" not in served
+    assert served["rdfs:label"] == "T"
+    assert served["@context"]["ex"] == "http://example.org/"
+    assert "brick" not in served["@context"]
+
+    rv = jsonld_doc_response(doc, "text/turtle,application/ld+json;q=0.9")
+    assert rv.media_type == "text/turtle"
+    assert '"T"' in rv.body.decode()
+
+
+def test_with_equivalences_unset():
+    update = with_equivalences_unset(
+        {"$set": {"rdfs:label": "T", "owl:sameAs": "ex:t"}}
+    )
+    assert update["$set"] == {"rdfs:label": "T", "owl:sameAs": "ex:t"}
+    assert set(update["$unset"]) == {"owl:equivalentProperty", "owl:equivalentClass"}
+    # Writes into an equivalence depend on its old value, so can't be merged.
+    assert with_equivalences_unset({"$set": {"owl:sameAs.0": "ex:t"}}) is None
+    assert with_equivalences_unset({"$push": {"owl:sameAs": "ex:t"}}) is None
+    assert with_equivalences_unset({"$rename": {"ex:p": "owl:sameAs"}}) is None
+    assert with_equivalences_unset({"$rename": {"owl:sameAs": "ex:p"}}) is None
+
+
+def test_array_updates_apply_after_equivalences_are_cleared():
+    mdb = mongo_db()
+    term_id = "http://example.org/equivalences-test"
+    mdb.terms.insert_one({"@id": term_id, "owl:sameAs": ["ex:old"]})
+    try:
+        for op in ("$push", "$addToSet"):
+            mdb.terms.update_one({"@id": term_id}, {"$set": {"owl:sameAs": ["ex:old"]}})
+            doc = update_doc_clearing_equivalences(
+                mdb.terms, {"@id": term_id}, {op: {"owl:sameAs": "ex:new"}}
+            )
+            assert doc["owl:sameAs"] == ["ex:new"]
+        mdb.terms.update_one({"@id": term_id}, {"$set": {"ex:p": "ex:renamed"}})
+        doc = update_doc_clearing_equivalences(
+            mdb.terms, {"@id": term_id}, {"$rename": {"ex:p": "owl:sameAs"}}
+        )
+        assert doc["owl:sameAs"] == "ex:renamed"
+        assert (
+            update_doc_clearing_equivalences(
+                mdb.terms,
+                {"@id": "http://example.org/missing"},
+                {"$push": {"owl:sameAs": "x"}},
+            )
+            is None
+        )
+    finally:
+        mdb.terms.delete_one({"@id": term_id})
+
+
+def test_term_cards_for():
+    g = Graph().parse(
+        format="turtle",
+        data="""
+        @prefix ex: <http://example.org/> .
+        @prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+        @prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+        ex:b rdfs:isDefinedBy ex:ns ; rdfs:label "B" ; rdfs:comment "bee" .
+        ex:a rdfs:isDefinedBy ex:ns ; skos:prefLabel "A" ; rdfs:label "ay" ;
+            skos:definition "the letter a" .
+        ex:c rdfs:isDefinedBy ex:other ; rdfs:label "C" .
+        """,
+    )
+    cards = term_cards_for(URIRef("http://example.org/ns"), g)
+    assert [(c["url"], str(c["label"]), str(c["definition"])) for c in cards] == [
+        ("http://example.org/a", "A", "the letter a"),
+        ("http://example.org/b", "B", "bee"),
+    ]
+
+
+def test_doc_validators_follow_revision():
+    doc = {"@id": "http://example.org/t", "_v": 1}
+    turtle = doc_validators(doc, "text/turtle")
+    assert turtle == doc_validators(dict(doc, **{"rdfs:label": "x"}), "text/turtle")
+    assert turtle["ETag"] != doc_validators(doc, "application/ld+json")["ETag"]
+    assert turtle["ETag"] != doc_validators(dict(doc, _v=2), "text/turtle")["ETag"]
+    assert "Last-Modified" not in turtle
+
+
+def test_failed_distribution_fetches_are_remembered(monkeypatch):
+    calls = []
+
+    def get(uri, **kwargs):
+        calls.append(uri)
+        raise requests.ConnectionError()
+
+    monkeypatch.setattr(distribution_session, "get", get)
+    uri = "https://example.org/unreachable-distribution"
+    assert fetch_distribution_ttl(uri) is None
+    assert fetch_distribution_ttl(uri) is None
+    assert calls == [uri]
+
+
+def test_recreated_doc_gets_new_validators():
+    mdb = mongo_db()
+    term_id = "http://example.org/recreated-term"
+    try:
+        mdb.terms.insert_one({"@id": term_id, **first_revision()})
+        old = doc_validators(mdb.terms.find_one({"@id": term_id}), "text/turtle")
+        mdb.terms.delete_one({"@id": term_id})
+        time.sleep(0.002)
+        mdb.terms.insert_one({"@id": term_id, "rdfs:label": "new", **first_revision()})
+        new = doc_validators(mdb.terms.find_one({"@id": term_id}), "text/turtle")
+        assert not not_modified(new, old["ETag"])
+    finally:
+        mdb.terms.delete_one({"@id": term_id})
+
+
+def test_recreated_namespace_gets_new_html():
+    mdb = mongo_db()
+    ns_id = "http://example.org/recreated-ns"
+
+    def ns_doc(title):
+        return {
+            "@context": {
+                "owl": "http://www.w3.org/2002/07/owl#",
+                "dct": "http://purl.org/dc/terms/",
+            },
+            "@id": ns_id,
+            "@type": "owl:Ontology",
+            "dct:title": title,
+            **first_revision(),
+        }
+
+    no_terms = {"@id": "no terms"}
+    old = namespace_html_response(mdb, ns_doc("Old title"), no_terms, "text/html")
+    time.sleep(0.002)
+    new = namespace_html_response(mdb, ns_doc("New title"), no_terms, "text/html")
+    assert b"Old title" in old.body
+    assert b"New title" in new.body
+
+
+def test_import_replaces_a_cached_target_term():
+    mdb = mongo_db()
+    naan, dt_now = int(NAAN), now()
+    src_uri = f"{API_HOST}/ark:{naan}/2020/01/testorg/importsrc/t"
+    tgt_uri = (
+        f"{API_HOST}/ark:{naan}/{dt_now.year}/{dt_now.month:02d}/testorg/importtgt/t"
+    )
+    agent = Agent(
+        id=f"ark:{naan}/9999/12/system/agents/importer",
+        username="importer",
+        hashed_password="",
+        can_admin_shoulders=[],
+        can_edit=[],
+        can_admin=["testorg"],
+        type="software_agent",
+    )
+    mdb.terms.insert_one({"@id": src_uri, "rdfs:label": "imported"})
+    # e.g. left from before another worker deleted the term
+    doc_cache.put(tgt_uri, {"@id": tgt_uri, "rdfs:label": "stale"})
+    try:
+        import_term(
+            naan,
+            dt_now.year,
+            dt_now.month,
+            "testorg",
+            "importtgt",
+            "t",
+            TermImport(term_uri=src_uri),
+            agent=agent,
+            mdb=mdb,
+            accept="application/ld+json",
+        )
+        rv = get_term(
+            naan,
+            dt_now.year,
+            dt_now.month,
+            "testorg",
+            "importtgt",
+            "t",
+            mdb=mdb,
+            accept="application/ld+json",
+            if_none_match=None,
+            if_modified_since=None,
+        )
+        assert json.loads(rv.body)["rdfs:label"] == "imported"
+    finally:
+        mdb.terms.delete_many({"@id": {"$in": [src_uri, tgt_uri]}})
+
+
+def test_storage_fields_are_not_writable():
+    for update in [
+        {"$set": {"_pool": "ark:57802/fk1"}},
+        {"$inc": {"_v": 1}},
+        {"$rename": {"rdfs:label": "_modified"}},
+    ]:
+        with pytest.raises(HTTPException):
+            check_no_storage_fields(updated_fields(update))
+    with pytest.raises(HTTPException):
+        check_no_storage_fields({"rdfs:label": "x", "_pool": "ark:57802/fk1"})
+    check_no_storage_fields(updated_fields({"$set": {"_t": "http://example.org/"}}))
+
+
+def test_term_docs_with_invalid_ids_are_reported():
+    ns_uri = "http://example.org/ark:57802/2020/01/org/repo"
+    docs = [{"@id": "t1"}, {"@id": 7}, {"@id": ["t2"]}, {"rdfs:label": "no id"}]
+    valid, errors = validate_term_docs(docs, ns_uri)
+    assert [d["@id"] for d in valid] == [f"{ns_uri}/t1"]
+    assert [(e["index"], e["@id"]) for e in errors] == [
+        (1, 7),
+        (2, ["t2"]),
+        (3, None),
+    ]
@@ -0,0 +1,24 @@
+from xyz_polyneme_ns import db
+from xyz_polyneme_ns.metrics import Histogram
+
+
+def test_histogram_samples_are_cumulative():
+    h = Histogram(buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 3):
+        h.observe(value, collection="terms", command="find")
+    samples = {(suffix, labels.get("le")): v for suffix, labels, v in h.samples()}
+    assert samples[("_bucket", "0.01")] == 1
+    assert samples[("_bucket", "0.1")] == 3
+    assert samples[("_bucket", "+Inf")] == 4
+    assert samples[("_count", None)] == 4
+    assert abs(samples[("_sum", None)] - 3.105) < 1e-9
+
+
+def test_pool_options_only_includes_what_is_set(monkeypatch):
+    monkeypatch.setattr(db, "MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setattr(db, "MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+    monkeypatch.setattr(db, "MONGO_READ_PREFERENCE", None)
+    options = db.pool_options()
+    assert options["maxPoolSize"] == 50
+    assert options["waitQueueTimeoutMS"] == 2000
+    assert "readPreference" not in options
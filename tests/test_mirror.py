@@ -0,0 +1,78 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from xyz_polyneme_ns.mirror import RemoteMirror
+
+TTL = b"<http://example.org/a> <http://example.org/b> <http://example.org/c> .\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    body = TTL
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Type", "text/turtle")
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = HTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/doc.ttl"
+    server.shutdown()
+
+
+def test_mirror_fetches_once_then_revalidates(tmp_path, stub_url):
+    mirror = RemoteMirror(tmp_path, {"doc": stub_url})
+    assert mirror.snapshot("doc") is None
+
+    assert mirror.refresh("doc") is True
+    snapshot = mirror.snapshot("doc")
+    assert snapshot.read() == TTL
+
+    assert mirror.refresh("doc") is False
+    assert StubHandler.requests_seen[-1]["If-None-Match"] == '"v1"'
+    assert mirror.snapshot("doc") == snapshot
+
+    # a fresh mirror over the same directory serves the persisted copy
+    assert RemoteMirror(tmp_path, {"doc": stub_url}).snapshot("doc") == snapshot
+
+
+def test_mirror_tolerates_unreachable_source(tmp_path):
+    mirror = RemoteMirror(tmp_path, {"doc": "http://127.0.0.1:9/unreachable"})
+    mirror.refresh_all(missing_only=True)
+    assert mirror.snapshot("doc") is None
+
+
+def test_mirror_serves_new_versions_to_every_reader(tmp_path, stub_url, monkeypatch):
+    mirror = RemoteMirror(tmp_path, {"doc": stub_url})
+    other_worker = RemoteMirror(tmp_path, {"doc": stub_url})
+    mirror.refresh("doc")
+    old = other_worker.snapshot("doc")
+
+    new_ttl = TTL.replace(b"/c>", b"/d>")
+    monkeypatch.setattr(StubHandler, "body", new_ttl)
+    monkeypatch.setattr(StubHandler, "etag", '"v2"')
+    assert mirror.refresh("doc") is True
+
+    new = other_worker.snapshot("doc")
+    assert new.version != old.version
+    assert new.read() == new_ttl
+    # a reader still on the replaced version can finish
+    assert old.read() == TTL
+    assert not list(tmp_path.glob(".*.tmp"))
@@ -0,0 +1,63 @@
+import rdflib
+
+from xyz_polyneme_ns.negotiation import (
+    HTML,
+    N_QUADS,
+    NDJSON,
+    SERIALIZATIONS,
+    acceptable,
+    parse_accept,
+)
+
+
+def test_parse_accept():
+    assert parse_accept(
+        "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
+    ) == [
+        ("text/html", 1.0),
+        ("application/xhtml+xml", 1.0),
+        ("image/webp", 1.0),
+        ("application/xml", 0.9),
+        ("*/*", 0.8),
+    ]
+    assert parse_accept("text/turtle;charset=utf-8;q=0.5, text/html;level=1") == [
+        ("text/html", 1.0),
+        ("text/turtle", 0.5),
+    ]
+    assert parse_accept("text/turtle;q=0, application/ld+json") == [
+        ("application/ld+json", 1.0)
+    ]
+    assert parse_accept(None) == [("*/*", 1.0)]
+
+
+def test_acceptable():
+    types_ = [s.media_type for s in acceptable("image/png, text/*;q=0.5")]
+    assert types_ == ["text/turtle", "text/n3", "text/html"]
+
+    types_ = [s.media_type for s in acceptable("text/html;q=0.5,nt,turtle;q=0.8")]
+    assert types_ == ["application/n-triples", "text/turtle", "text/html"]
+
+    assert acceptable("*/*")[0].media_type == "text/turtle"
+    assert HTML in acceptable("text/html")
+    assert acceptable("image/png") == ()
+
+
+def test_acceptable_extra():
+    assert acceptable("application/x-ndjson") == ()
+    assert acceptable("application/x-ndjson", extra=(NDJSON,)) == (NDJSON,)
+    assert NDJSON not in acceptable("*/*", extra=(NDJSON,))
+
+
+def test_every_advertised_serialization_works_on_a_plain_graph():
+    g = rdflib.Graph().parse(
+        data='<http://example.org/a> <http://example.org/p> "a" .', format="nt"
+    )
+    for name, serialization in SERIALIZATIONS.items():
+        if serialization != HTML:
+            assert g.serialize(format=serialization.format), name
+    assert acceptable("application/trix") == ()
+    types_ = [
+        s.media_type for s in acceptable("application/n-quads, text/turtle;q=0.5")
+    ]
+    assert types_ == ["text/turtle"]
+    assert acceptable("nquads", extra=(N_QUADS,)) == (N_QUADS,)
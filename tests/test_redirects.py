@@ -0,0 +1,70 @@
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.main import doc_cache
+from xyz_polyneme_ns.redirects import (
+    RedirectIndex,
+    RedirectMiddleware,
+    redirect_index,
+)
+
+
+def test_redirect_index_holds_only_redirects():
+    mdb = mongo_db()
+    redirect_ark, skolem_ark = "ark:57802/fk1redirtest", "ark:57802/fk1skoltest"
+    mdb.arks.insert_many(
+        [
+            {"_id": redirect_ark, "_t": "https://example.org/"},
+            {"_id": skolem_ark, "@id": f"https://n2t.net/{skolem_ark}"},
+        ]
+    )
+    try:
+        index = RedirectIndex(maxsize=1)
+        assert index.lookup(mdb, redirect_ark) == ("https://example.org/", None)
+        assert index.get(redirect_ark) == "https://example.org/"
+
+        target, doc = index.lookup(mdb, skolem_ark)
+        assert target is None and doc["_id"] == skolem_ark
+        assert index.get(skolem_ark) is None
+
+        index.put("ark:57802/fk1other", "https://example.com/")
+        assert index.get(redirect_ark) is None  # evicted: bounded
+        assert index.lookup(mdb, "ark:57802/fk1missing") == (None, None)
+    finally:
+        mdb.arks.delete_many({"_id": {"$in": [redirect_ark, skolem_ark]}})
+
+
+def test_redirect_middleware():
+    async def app(scope, receive, send):
+        await PlainTextResponse("routed")(scope, receive, send)
+
+    index = RedirectIndex()
+    index.put("ark:57802/fk1234", "http://example.org")
+    client = TestClient(
+        RedirectMiddleware(
+            app,
+            api_host="http://testserver",
+            index=index,
+            forwards={"/ark:57802/p0": "https://example.com/pids"},
+        )
+    )
+
+    for path in ["/ark:57802/fk1234", "/ark:/57802/fk1234"]:
+        rv = client.get(path, follow_redirects=False)
+        assert rv.status_code == 303
+        assert rv.headers["location"] == "http://example.org"
+
+    rv = client.get("/ark:/57802/p0abc/def?x=1", follow_redirects=False)
+    assert rv.status_code == 302
+    assert rv.headers["location"] == "https://example.com/pids/ark:57802/p0abc/def?x=1"
+
+    for path in ["/ark:57802/fk1999", "/ark:57802/p0", "/ark:57802/fk1234/more"]:
+        assert client.get(path).text == "routed"
+    assert client.post("/ark:57802/fk1234").text == "routed"
+
+
+def test_skolem_invalidation_drops_redirect():
+    redirect_index.put("ark:57802/fk1dropme", "https://example.org/")
+    doc_cache.discard("ark:57802/fk1dropme")
+    assert redirect_index.get("ark:57802/fk1dropme") is None
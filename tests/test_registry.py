@@ -0,0 +1,20 @@
+from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.registry import NaanRegistry
+from xyz_polyneme_ns.util import NAAN
+
+
+def test_registry_answers_from_memory_until_reloaded():
+    mdb = mongo_db()
+    naan, fake_shoulder = int(NAAN), "fkfkfkfk5"
+    registry = NaanRegistry()
+    assert registry.has_naan(mdb, naan)
+    assert not registry.has_naan(mdb, 1)
+    assert fake_shoulder not in registry.shoulders(mdb, naan)
+
+    mdb.naans.update_one({"_id": naan}, {"$addToSet": {"shoulders": fake_shoulder}})
+    try:
+        assert fake_shoulder not in registry.shoulders(mdb, naan)
+        registry.load(mdb)
+        assert fake_shoulder in registry.shoulders(mdb, naan)
+    finally:
+        mdb.naans.update_one({"_id": naan}, {"$pull": {"shoulders": fake_shoulder}})
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from xyz_polyneme_ns.db import acquire_lease, mongo_db, release_lease
+from xyz_polyneme_ns.main import publish_closed_month_snapshots, render_snapshot
+from xyz_polyneme_ns.snapshots import SnapshotStore, entry_doc
+
+NS_URI = "http://example.org/ark:57802/2020/01/org/repo"
+
+
+def test_snapshot_store_publishes_content_addressed_objects(tmp_path):
+    store = SnapshotStore(tmp_path)
+    ns_doc = {"@id": NS_URI, "_v": 3, "_modified": datetime(2020, 1, 31)}
+    term_docs = [{"@id": f"{NS_URI}/a", "_v": 1}, {"@id": f"{NS_URI}/b", "_v": 1}]
+
+    def render(docs, media_type):
+        if media_type == "text/html" and len(docs) == 1:
+            return None
+        return f"{len(docs)} docs as {media_type}".encode()
+
+    assert store.manifest(NS_URI) is None
+    store.publish(ns_doc, iter(term_docs), render)
+    manifest = store.manifest(NS_URI)
+    assert entry_doc(manifest) == ns_doc
+    assert "text/html" in manifest["artifacts"]
+    assert set(manifest["terms"]) == {"a", "b"}
+    assert "text/html" not in manifest["terms"]["a"]["artifacts"]
+    # Both terms render to the same bytes, so share one object.
+    sha256 = manifest["terms"]["a"]["artifacts"]["text/turtle"]
+    assert sha256 == manifest["terms"]["b"]["artifacts"]["text/turtle"]
+    assert store.object_path(sha256).read_bytes() == b"1 docs as text/turtle"
+
+
+def test_render_snapshot_only_in_the_requested_format():
+    term_doc = {
+        "@context": {"rdfs": "http://www.w3.org/2000/01/rdf-schema#"},
+        "@id": f"{NS_URI}/a",
+        "rdfs:label": "a",
+    }
+    assert b"rdfs:label" in render_snapshot([term_doc], "text/turtle")
+    assert render_snapshot([term_doc], "text/html") is None
+
+
+def test_only_one_worker_publishes_at_a_time():
+    mdb = mongo_db()
+    owner = acquire_lease(mdb, "snapshots", 60)  # as if another worker publishes
+    try:
+        mdb.namespaces.insert_one({"@id": NS_URI})
+        assert publish_closed_month_snapshots(mdb) == 0
+    finally:
+        release_lease(mdb, "snapshots", owner)
+        mdb.namespaces.delete_one({"@id": NS_URI})
@@ -0,0 +1,35 @@
+import json
+
+import rdflib
+
+from xyz_polyneme_ns.negotiation import NDJSON, SERIALIZATIONS
+from xyz_polyneme_ns.streaming import stream_namespace
+
+CONTEXT = {"rdfs": "http://www.w3.org/2000/01/rdf-schema#"}
+NS_DOC = {"_id": 0, "@id": "http://example.org/ns", "@context": CONTEXT}
+TERM_DOCS = [
+    {"_id": i, "@id": f"http://example.org/ns/t{i}", "rdfs:label": f"T{i}"}
+    | {"@context": CONTEXT}
+    for i in range(5)
+]
+
+
+def test_stream_namespace_ntriples_in_batches():
+    chunks = list(
+        stream_namespace(
+            NS_DOC,
+            iter(TERM_DOCS),
+            SERIALIZATIONS["application/n-triples"],
+            batch_size=2,
+        )
+    )
+    assert len(chunks) == 1 + 3
+    g = rdflib.Graph().parse(data="".join(chunks), format="nt")
+    assert len(g) == len(TERM_DOCS)
+
+
+def test_stream_namespace_ndjson():
+    lines = "".join(stream_namespace(NS_DOC, iter(TERM_DOCS), NDJSON)).splitlines()
+    docs = [json.loads(line) for line in lines]
+    assert [d["@id"] for d in docs[1:]] == [d["@id"] for d in TERM_DOCS]
+    assert all("_id" not in d for d in docs)
@@ -0,0 +1,21 @@
+import os
+
+from xyz_polyneme_ns.vocabs import agu_index, agu_term_graph, AGU_INDEX_TERMS_FILE
+
+
+def test_agu_term_lookup():
+    g = agu_term_graph("0200")
+    assert g is not None
+    assert len(g) > 0
+    assert agu_term_graph("not-a-code") is None
+
+
+def test_agu_index_reloads_on_mtime_change(tmp_path):
+    filename = tmp_path.joinpath("agu.ttl")
+    filename.write_text(AGU_INDEX_TERMS_FILE.read_text())
+    index = agu_index(filename)
+    assert agu_index(filename) is index
+
+    stat = os.stat(filename)
+    os.utime(filename, (stat.st_atime, stat.st_mtime + 1))
+    assert agu_index(filename) is not index
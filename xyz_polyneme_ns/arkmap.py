@@ -0,0 +1,109 @@
+"""Loading ark_map.csv (ARK -> redirect target URL) into `arks` at startup.
+
+The file's hash is recorded in `file_loads`, so an unchanged file costs one
+query. A changed file is streamed in batches, and only rows whose hash differs
+from the one stored on their doc (`_h`) are written. A lock on the `file_loads`
+doc means that of several workers booting at once, only one does the load.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from pymongo import ReplaceOne
+from pymongo.database import Database as MongoDatabase
+from pymongo.errors import DuplicateKeyError
+from toolz import partition_all
+
+from xyz_polyneme_ns.redirects import RedirectIndex
+
+ARK_MAP_LOAD_BATCH_SIZE = int(os.getenv("ARK_MAP_LOAD_BATCH_SIZE") or 1000)
+# How long a worker may hold the load before others assume it died.
+ARK_MAP_LOAD_LOCK_SECONDS = float(os.getenv("ARK_MAP_LOAD_LOCK_SECONDS") or 300)
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_hash(row: Dict[str, str]) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def ark_map_docs(path: Path) -> Iterator[dict]:
+    with open(path) as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield {"_id": row["ark"], "_t": row["url"], "_h": row_hash(row)}
+
+
+def acquire_load_lock(
+    mdb: MongoDatabase, name: str, seconds: float = ARK_MAP_LOAD_LOCK_SECONDS
+) -> bool:
+    now = time.time()
+    try:
+        mdb.file_loads.find_one_and_update(
+            {"_id": name, "locked_until": {"$not": {"$gt": now}}},
+            {"$set": {"locked_until": now + seconds}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:  # another worker holds the lock
+        return False
+
+
+def upsert_changed(mdb: MongoDatabase, docs: List[dict]) -> int:
+    """Write the docs in `docs` whose row hash differs from the stored one."""
+    stored = {
+        d["_id"]: d.get("_h")
+        for d in mdb.arks.find({"_id": {"$in": [d["_id"] for d in docs]}}, ["_h"])
+    }
+    changed = [d for d in docs if stored.get(d["_id"], "") != d["_h"]]
+    if changed:
+        mdb.arks.bulk_write(
+            [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in changed],
+            ordered=False,
+        )
+    return len(changed)
+
+
+def load_ark_map(
+    mdb: MongoDatabase,
+    path: Path,
+    index: Optional[RedirectIndex] = None,
+    batch_size: int = ARK_MAP_LOAD_BATCH_SIZE,
+) -> Optional[int]:
+    """Bring `arks` up to date with the CSV at `path`, and fill `index` from it.
+
+    Returns the number of rows written, or None if the load was skipped because
+    the file is unchanged or another worker is loading it.
+    """
+    name = path.name
+    if index is not None:
+        index.put_many((d["_id"], d["_t"]) for d in ark_map_docs(path))
+    sha256 = file_sha256(path)
+    state = mdb.file_loads.find_one({"_id": name}) or {}
+    if state.get("sha256") == sha256 or not acquire_load_lock(mdb, name):
+        return None
+    try:
+        # Another worker may have finished the load since we checked.
+        if (mdb.file_loads.find_one({"_id": name}) or {}).get("sha256") == sha256:
+            return None
+        n_written = sum(
+            upsert_changed(mdb, list(batch))
+            for batch in partition_all(batch_size, ark_map_docs(path))
+        )
+        mdb.file_loads.update_one({"_id": name}, {"$set": {"sha256": sha256}})
+        logger.info(f"Loaded {name}: {n_written} rows written")
+        return n_written
+    finally:
+        mdb.file_loads.update_one({"_id": name}, {"$unset": {"locked_until": ""}})
@@ -0,0 +1,153 @@
+"""Pools of pre-minted ARK blades, so skolem creation doesn't have to mint one.
+
+Pooled ARKs are reserved in `arks` as `{"_id": <ark>, "_pool": "ark:<naan>/<shoulder>"}`,
+so the unique `_id` index keeps them from being minted twice. Claiming one
+replaces it with the new skolem's doc, dropping its `_pool` marker.
+
+Pools are only kept for shoulders minted here (not forwarded to another NMA) that
+have minted at least one ARK, so unused shoulders reserve nothing. One worker at
+a time refills them, holding the "ark_pools" lease (see `db.acquire_lease`).
+"""
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.database import Database as MongoDatabase
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+from toolz import merge
+
+from xyz_polyneme_ns.db import acquire_lease, release_lease
+from xyz_polyneme_ns.idgen import (
+    blade_length_runs,
+    generate_ark_bons,
+    next_ark_count,
+)
+from xyz_polyneme_ns.redirects import shoulder_forwards
+
+ARK_POOL_SIZE = int(os.getenv("ARK_POOL_SIZE") or 2000)
+ARK_POOL_LOW_WATER = int(os.getenv("ARK_POOL_LOW_WATER") or 500)
+ARK_POOL_REFILL_BATCH = int(os.getenv("ARK_POOL_REFILL_BATCH") or 1000)
+ARK_POOL_CHECK_SECONDS = float(os.getenv("ARK_POOL_CHECK_SECONDS") or 5)
+# How long a worker may hold the refilling before others assume it died.
+ARK_POOL_REFILL_LEASE_SECONDS = float(os.getenv("ARK_POOL_REFILL_LEASE_SECONDS") or 300)
+
+logger = logging.getLogger(__name__)
+
+
+def pool_key(naan: int, shoulder: str) -> str:
+    return f"ark:{naan}/{shoulder}"
+
+
+def pool_depth(mdb: MongoDatabase, naan: int, shoulder: str) -> int:
+    return mdb.arks.count_documents({"_pool": pool_key(naan, shoulder)})
+
+
+def claim_ark(
+    mdb: MongoDatabase, naan: int, shoulder: str, doc: dict, id_prefix: str
+) -> Optional[dict]:
+    """Store `doc` as a pre-minted ARK from the pool for `naan` + `shoulder`.
+
+    The claim and the write are one update, which replaces the pooled doc with
+    `doc` and an `@id` of `id_prefix` + the ARK. Returns the stored doc, or None
+    if the pool is empty.
+    """
+    fields = {k: {"$literal": v} for k, v in doc.items()}
+    return mdb.arks.find_one_and_update(
+        # A doc with an `@id` has been claimed already, whatever else it holds.
+        {"_pool": pool_key(naan, shoulder), "@id": {"$exists": False}},
+        [
+            {"$project": {"_id": 1}},
+            {"$set": merge(fields, {"@id": {"$concat": [id_prefix, "$_id"]}})},
+        ],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def mint_into_pool(mdb: MongoDatabase, naan: int, shoulder: str, n: int) -> int:
+    """Mint `n` ARKs into the pool with one `insert_many`. Returns the number added.
+
+    Each ARK gets the sping length for its own place in the shoulder's count, as
+    if minted one at a time. Blades that collide with existing ARKs are dropped
+    rather than retried; the next refill makes up for them.
+    """
+    last = next_ark_count(mdb, naan, shoulder, n=n)
+    key = pool_key(naan, shoulder)
+    bons = [
+        bon
+        for n_chars, n_run in blade_length_runs(last - n + 1, last)
+        for bon in generate_ark_bons(naan, shoulder, n_run, n_chars)
+    ]
+    try:
+        rv = mdb.arks.insert_many(
+            [{"_id": bon, "_pool": key} for bon in bons], ordered=False
+        )
+        return len(rv.inserted_ids)
+    except BulkWriteError as e:
+        return e.details["nInserted"]
+
+
+def refill_pool(
+    mdb: MongoDatabase,
+    naan: int,
+    shoulder: str,
+    size: int = ARK_POOL_SIZE,
+    low_water: int = ARK_POOL_LOW_WATER,
+    batch: int = ARK_POOL_REFILL_BATCH,
+) -> int:
+    """Top up the pool to `size` if it has dropped below `low_water`."""
+    depth = pool_depth(mdb, naan, shoulder)
+    if depth >= low_water:
+        return depth
+    while depth < size:
+        n_added = mint_into_pool(mdb, naan, shoulder, min(batch, size - depth))
+        if n_added == 0:
+            break
+        depth += n_added
+    return depth
+
+
+def pooled_shoulders(mdb: MongoDatabase):
+    """(naan, shoulder) for registered shoulders that are minted here and in use."""
+    in_use = {d["_id"] for d in mdb.ark_counters.find({}, ["_id"])}
+    for naan_doc in mdb.naans.find({}, ["shoulders"]):
+        for shoulder in naan_doc["shoulders"]:
+            key = pool_key(naan_doc["_id"], shoulder)
+            if key in in_use and f"/{key}" not in shoulder_forwards:
+                yield naan_doc["_id"], shoulder
+
+
+def pool_depths(mdb: MongoDatabase):
+    """(labels, depth) samples for every pooled shoulder."""
+    for naan, shoulder in pooled_shoulders(mdb):
+        labels = {"naan": str(naan), "shoulder": shoulder}
+        yield labels, pool_depth(mdb, naan, shoulder)
+
+
+def refill_pools(mdb: MongoDatabase):
+    """Top up every pool, unless another worker is doing so.
+
+    Workers that each saw a pool below its low-water mark would otherwise each
+    mint a batch into it.
+    """
+    owner = acquire_lease(mdb, "ark_pools", ARK_POOL_REFILL_LEASE_SECONDS)
+    if owner is None:
+        return
+    try:
+        for naan, shoulder in pooled_shoulders(mdb):
+            refill_pool(mdb, naan, shoulder)
+    finally:
+        release_lease(mdb, "ark_pools", owner)
+
+
+async def keep_pools_filled(
+    mdb: MongoDatabase, interval: float = ARK_POOL_CHECK_SECONDS
+):
+    while True:
+        try:
+            await run_in_threadpool(refill_pools, mdb)
+        except Exception as e:
+            logger.warning(f"Could not refill ARK pools: {e}")
+        await asyncio.sleep(interval)
@@ -1,11 +1,25 @@
+import hashlib
+import hmac
+import logging
+import os
 import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from jose import JWTError, jwt
 from starlette import status
 
 from fastapi import Depends
 from fastapi.exceptions import HTTPException
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBasic,
+    HTTPBasicCredentials,
+    HTTPBearer,
+)
 from passlib.context import CryptContext
 
+from xyz_polyneme_ns.cache import TTLCache
 from xyz_polyneme_ns.db import mongo_db
 from xyz_polyneme_ns.models import Agent, get_agent_uri
 
@@ -21,11 +35,65 @@ def get_password_hash(password):
 
 
 security = HTTPBasic()
+optional_basic = HTTPBasic(auto_error=False)
+optional_bearer = HTTPBearer(auto_error=False)
 
+# Every worker must share the key, or tokens issued by one won't verify on another
+# (nor after a restart). Without one, no tokens are issued: agents use Basic auth.
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES") or 60)
 
-def get_current_agent(
-    naan: int, credentials: HTTPBasicCredentials = Depends(security)
-) -> Agent:
+logger = logging.getLogger(__name__)
+
+
+def warn_if_no_tokens():
+    if not JWT_SECRET_KEY:
+        logger.warning(
+            "JWT_SECRET_KEY is not set, so no bearer tokens will be issued. "
+            "Set it, to the same value for every worker, to issue them."
+        )
+
+
+CREDENTIALS_CACHE_SIZE = int(os.getenv("CREDENTIALS_CACHE_SIZE") or 1024)
+CREDENTIALS_CACHE_TTL = float(os.getenv("CREDENTIALS_CACHE_TTL") or 300)
+
+# Maps a keyed hash of (username, password) to the password hash it was verified
+# against, so repeat requests can skip bcrypt. The key is per-process, and plain
+# passwords are never stored.
+_credentials_key_secret = secrets.token_bytes(32)
+verified_credentials = TTLCache(
+    maxsize=CREDENTIALS_CACHE_SIZE, ttl=CREDENTIALS_CACHE_TTL
+)
+
+
+def credentials_key(username: str, password: str) -> bytes:
+    msg = f"{len(username)}:{username}:{password}".encode()
+    return hmac.new(_credentials_key_secret, msg, hashlib.sha256).digest()
+
+
+def check_password(username: str, password: str, hashed_password: str) -> bool:
+    """`verify_password`, skipping bcrypt for credentials recently verified.
+
+    A cache entry only counts if it was verified against `hashed_password`, so
+    changing an agent's password (or deleting the agent) invalidates it.
+    """
+    key = credentials_key(username, password)
+    verified_hash = verified_credentials.get(key)
+    if verified_hash is not None and secrets.compare_digest(
+        verified_hash, hashed_password
+    ):
+        return True
+    try:
+        correct = verify_password(password, hashed_password)
+    except ValueError:
+        correct = False
+    if correct:
+        verified_credentials.set(key, hashed_password)
+    return correct
+
+
+def authenticate_agent(naan: int, credentials: HTTPBasicCredentials) -> Agent:
     mdb = mongo_db()
     agent_doc = mdb.agents.find_one({"id": get_agent_uri(naan, credentials.username)})
     agent = Agent(**agent_doc) if agent_doc else None
@@ -38,11 +106,9 @@ def get_current_agent(
         )
         pass_to_check = "nope"
 
-    try:
-        verify_password(credentials.password, pass_to_check)
-        correct_password = True
-    except:
-        correct_password = False
+    correct_password = check_password(
+        credentials.username, credentials.password, pass_to_check
+    )
 
     if not (correct_username and correct_password):
         raise HTTPException(
@@ -51,3 +117,73 @@ def get_current_agent(
             headers={"WWW-Authenticate": "Basic"},
         )
     return agent
+
+
+def create_access_token(
+    naan: int, agent: Agent, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES
+) -> str:
+    """A signed token carrying everything `check_can_*` needs to know about `agent`.
+
+    Changes to the agent's permissions (or its deletion) take effect for requests
+    made with the token only once it expires.
+    """
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": agent.id,
+        "naan": naan,
+        "username": agent.username,
+        "type": agent.type.value,
+        "can_edit": agent.can_edit,
+        "can_admin": agent.can_admin,
+        "can_admin_shoulders": agent.can_admin_shoulders,
+        "iat": now,
+        "exp": now + timedelta(minutes=expires_minutes),
+    }
+    if not JWT_SECRET_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Tokens are not issued here: JWT_SECRET_KEY is not set.",
+        )
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def agent_from_token(naan: int, token: str) -> Agent:
+    """The agent a token was issued to, verified by signature alone."""
+    try:
+        if not JWT_SECRET_KEY:
+            raise JWTError("tokens are not issued here")
+        claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        if claims.get("naan") != naan:
+            raise JWTError("token was issued for another NAAN")
+        return Agent(
+            id=claims["sub"],
+            username=claims["username"],
+            hashed_password="",
+            can_edit=claims["can_edit"],
+            can_admin=claims["can_admin"],
+            can_admin_shoulders=claims["can_admin_shoulders"],
+            type=claims["type"],
+        )
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def get_current_agent(
+    naan: int,
+    credentials: Optional[HTTPBasicCredentials] = Depends(optional_basic),
+    token: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+) -> Agent:
+    """The requesting agent, from a bearer token if given, else from Basic auth."""
+    if token is not None:
+        return agent_from_token(naan, token.credentials)
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return authenticate_agent(naan, credentials)
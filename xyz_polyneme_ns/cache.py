@@ -0,0 +1,159 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from xyz_polyneme_ns.util import now
+
+MISSING = object()
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: str
+    last_modified: str
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(dt, usegmt=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of `etag` against an If-None-Match header value (RFC 7232)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag.removeprefix("W/")
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(
+    headers: Dict[str, str],
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str] = None,
+) -> bool:
+    """Whether a response with validator `headers` would be a 304 (RFC 7232).
+
+    If-Modified-Since is only consulted when there is no If-None-Match.
+    """
+    if if_none_match:
+        return etag_matches(if_none_match, headers["ETag"])
+    if not if_modified_since or "Last-Modified" not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return parsedate_to_datetime(headers["Last-Modified"]) <= since
+
+
+class ResponseCache:
+    """Rendered response bodies keyed by (route, negotiated media type).
+
+    Each route's entries are tied to a version token for its source (e.g. a file
+    mtime or content hash). Asking for a route with a different version drops all
+    of that route's entries. A media type that cannot be rendered for a route is
+    cached as `None`, so negotiation never re-attempts it.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Tuple[str, datetime, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, route: str, version: str) -> Tuple[datetime, dict]:
+        cached = self._routes.get(route)
+        if cached is None or cached[0] != version:
+            cached = (version, now(), {})
+            self._routes[route] = cached
+        return cached[1], cached[2]
+
+    def get(self, route: str, version: str, media_type: Optional[str]):
+        with self._lock:
+            _, entries = self._entries(route, version)
+            return entries.get(media_type, MISSING)
+
+    def put(
+        self,
+        route: str,
+        version: str,
+        media_type: Optional[str],
+        body: Optional[bytes],
+        response_media_type: Optional[str] = None,
+        last_modified: Optional[datetime] = None,
+    ) -> Optional[CachedResponse]:
+        with self._lock:
+            since, entries = self._entries(route, version)
+            entry = None
+            if body is not None:
+                entry = CachedResponse(
+                    body=body,
+                    media_type=response_media_type or media_type,
+                    etag=make_etag(body),
+                    last_modified=http_date(last_modified or since),
+                )
+            entries[media_type] = entry
+            return entry
+
+    def invalidate(self, route: Optional[str] = None):
+        with self._lock:
+            if route is None:
+                self._routes.clear()
+            else:
+                self._routes.pop(route, None)
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire `ttl` seconds after being set.
+
+    When full, setting a new key evicts the least recently used entry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -30,5 +30,28 @@ def update(ns_path: str, file: typer.FileText = typer.Option(..., "--file", "-f"
     typer.echo(rv.content)
 
 
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "nt": "application/n-triples",
+    "nquads": "application/n-quads",
+}
+
+
+@app.command()
+def export(
+    ns_path: str,
+    format_: str = typer.Option("ndjson", "--format", help="ndjson, nt or nquads"),
+    output: typer.FileBinaryWrite = typer.Option("-", "--output", "-o"),
+):
+    """stream a namespace and all its terms to a file (default: stdout)."""
+    accept = EXPORT_MEDIA_TYPES.get(format_)
+    if accept is None:
+        raise typer.BadParameter(f"--format must be one of {list(EXPORT_MEDIA_TYPES)}")
+    rv = req("GET", ns_path, headers={"Accept": accept}, stream=True)
+    rv.raise_for_status()
+    for chunk in rv.iter_content(chunk_size=65536):
+        output.write(chunk)
+
+
 # TODO `def list` to list existing namespaces that I can_admin or can_edit.
 # TODO `def config` to set default namespace for `update` (`termeric ns update . -f tmp.json`?)
@@ -2,6 +2,7 @@ import json
 from typing import Optional
 
 import typer
+from toolz import partition_all
 
 from xyz_polyneme_ns.cli.util import req
 
@@ -16,6 +17,24 @@ def create(shoulder: str, file: typer.FileText = typer.Option(..., "--file", "-f
     typer.echo(rv.content)
 
 
+@app.command("create-many")
+def create_many(
+    shoulder: str,
+    file: typer.FileText = typer.Option(..., "--file", "-f"),
+    chunk_size: int = 1000,
+):
+    """create a skolem per line of a JSON Lines file, `chunk_size` per request."""
+    lines = (line for line in file if line.strip())
+    for chunk in partition_all(chunk_size, lines):
+        rv = req(
+            "POST",
+            f"/{shoulder}:bulk",
+            data="".join(chunk).encode(),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        typer.echo(rv.content)
+
+
 @app.command()
 def read(assigned_base_name: str, accept: Optional[str] = ACCEPT):
     rv = req("GET", f"/{assigned_base_name}", headers={"Accept": accept})
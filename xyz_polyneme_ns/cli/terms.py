@@ -1,7 +1,9 @@
 import json
+from pathlib import Path
 from typing import Optional
 
 import typer
+from toolz import partition_all
 
 from xyz_polyneme_ns.cli.util import req
 
@@ -28,3 +30,41 @@ def read(term_path: str, accept: Optional[str] = ACCEPT):
 def update(term_path: str, file: typer.FileText = typer.Option(..., "--file", "-f")):
     rv = req("PATCH", term_path, json={"update": json.load(file)})
     typer.echo(rv.content)
+
+
+IMPORT_CONTENT_TYPES = {
+    ".ttl": "text/turtle",
+    ".jsonld": "application/ld+json",
+    ".nt": "application/n-triples",
+    ".jsonl": "application/x-ndjson",
+    ".ndjson": "application/x-ndjson",
+}
+
+
+@app.command("import-file")
+def import_file(
+    ns_path: str,
+    file: Path = typer.Option(..., "--file", "-f", exists=True, dir_okay=False),
+    content_type: Optional[str] = None,
+    chunk_size: int = 1000,
+):
+    """create terms in a namespace from an RDF or JSON Lines file.
+
+    The format is guessed from the file extension unless `--content-type` is given.
+    JSON Lines files are sent `chunk_size` lines per request.
+    """
+    content_type = content_type or IMPORT_CONTENT_TYPES.get(file.suffix)
+    if content_type is None:
+        raise typer.BadParameter(f"Unknown format for {file}; use --content-type.")
+    headers = {"Content-Type": content_type}
+    with file.open("rb") as f:
+        if content_type == "application/x-ndjson":
+            lines = (line for line in f if line.strip())
+            for chunk in partition_all(chunk_size, lines):
+                rv = req(
+                    "POST", f"{ns_path}:bulk", data=b"".join(chunk), headers=headers
+                )
+                typer.echo(rv.content)
+        else:
+            rv = req("POST", f"{ns_path}:bulk", data=f, headers=headers)
+            typer.echo(rv.content)
@@ -1,17 +1,91 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import typer
 from requests import request
 from toolz import merge
 
 from xyz_polyneme_ns.util import HOST, NAAN, USER, PASS, ACCEPT
 
+# Bearer tokens are kept here, per host/NAAN/user, so that each `termeric` run
+# doesn't have to fetch (and the server verify a password for) a new one.
+TOKEN_FILE = Path(
+    os.environ.get("TERMERIC_CONFIG_DIR") or typer.get_app_dir("termeric")
+).joinpath("tokens.json")
+# Refresh a little early so a token doesn't expire mid-request.
+TOKEN_EXPIRY_MARGIN_SECONDS = 30
+
+# Set once the server has declined to issue a token, so this run uses Basic auth.
+_no_tokens = {"declined": False}
+
+
+def _token_key() -> str:
+    return f"{HOST}|{NAAN}|{USER}"
+
+
+def _read_tokens() -> dict:
+    try:
+        return json.loads(TOKEN_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_token(access_token: str, expires_at: float):
+    tokens = {
+        key: token
+        for key, token in _read_tokens().items()
+        if token["expires_at"] > time.time()
+    }
+    tokens[_token_key()] = {"access_token": access_token, "expires_at": expires_at}
+    TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = TOKEN_FILE.with_name(f".{TOKEN_FILE.name}.tmp")
+    tmp.touch(mode=0o600)
+    tmp.write_text(json.dumps(tokens))
+    os.replace(tmp, TOKEN_FILE)
+
+
+def access_token(refresh=False):
+    """A bearer token for USER, or None if the server doesn't issue tokens."""
+    if _no_tokens["declined"]:
+        return None
+    if not refresh:
+        token = _read_tokens().get(_token_key())
+        if token is not None and time.time() < token["expires_at"]:
+            return token["access_token"]
+    rv = request(
+        "POST",
+        f"{HOST}/ark:{NAAN}/9999/12/system/agents/token",
+        auth=(USER, PASS),
+    )
+    if rv.status_code != 200:
+        _no_tokens["declined"] = True
+        return None
+    payload = rv.json()
+    expires_at = time.time() + payload["expires_in"] - TOKEN_EXPIRY_MARGIN_SECONDS
+    try:
+        _save_token(payload["access_token"], expires_at)
+    except OSError:
+        pass  # e.g. a read-only home directory: the token still serves this run
+    return payload["access_token"]
+
 
 def req(method, path, **kwargs):
     url = f"{HOST}/ark:{NAAN}{path}"
     headers = merge({"Accept": ACCEPT}, kwargs.get("headers", {}))
     kwargs.pop("headers", None)
-    return request(
-        method,
-        url,
-        auth=(USER, PASS),
-        headers=headers,
-        **kwargs,
-    )
+    for refresh in (False, True):
+        token = access_token(refresh=refresh)
+        if token is None:
+            return request(method, url, auth=(USER, PASS), headers=headers, **kwargs)
+        rv = request(
+            method,
+            url,
+            headers=merge(headers, {"Authorization": f"Bearer {token}"}),
+            **kwargs,
+        )
+        # A file-like body has been consumed, so can't be re-sent.
+        if rv.status_code != 401 or hasattr(kwargs.get("data"), "read"):
+            break
+    return rv
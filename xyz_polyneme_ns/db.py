@@ -1,11 +1,18 @@
+import logging
 import os
+import time
+import uuid
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 from pymongo import MongoClient
+from pymongo.collection import Collection
 from pymongo.database import Database as MongoDatabase
-from toolz import merge
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from toolz import dissoc, merge
 
+from xyz_polyneme_ns.dbmonitor import event_listeners
 from xyz_polyneme_ns.util import REPO_ROOT_DIR
 
 MONGO_HOST = os.getenv("MONGO_HOST")
@@ -15,6 +22,34 @@ MONGO_PASSWORD = os.getenv("MONGO_PASSWORD")
 MONGO_DBNAME = os.getenv("MONGO_DBNAME")
 MONGO_TLS = os.getenv("MONGO_TLS")
 MONGO_TLS_CA_FILE = os.getenv("MONGO_TLS_CA_FILE")
+MONGO_MAX_POOL_SIZE = os.getenv("MONGO_MAX_POOL_SIZE")
+MONGO_MIN_POOL_SIZE = os.getenv("MONGO_MIN_POOL_SIZE")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS")
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE")
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS")
+
+logger = logging.getLogger(__name__)
+
+
+def pool_options() -> dict:
+    """`MongoClient` options for pooling, timeouts etc. that are set in the env.
+
+    Unset options keep pymongo's defaults.
+    """
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE and int(MONGO_MAX_POOL_SIZE),
+        "minPoolSize": MONGO_MIN_POOL_SIZE and int(MONGO_MIN_POOL_SIZE),
+        "waitQueueTimeoutMS": (
+            MONGO_WAIT_QUEUE_TIMEOUT_MS and int(MONGO_WAIT_QUEUE_TIMEOUT_MS)
+        ),
+        "serverSelectionTimeoutMS": (
+            MONGO_SERVER_SELECTION_TIMEOUT_MS and int(MONGO_SERVER_SELECTION_TIMEOUT_MS)
+        ),
+        "readPreference": MONGO_READ_PREFERENCE,
+        "compressors": MONGO_COMPRESSORS,
+    }
+    return {k: v for k, v in options.items() if v}
 
 
 @lru_cache
@@ -35,5 +70,92 @@ def mongo_db() -> MongoDatabase:
         kwargs = merge(kwargs, dict(username=username, password=password))
     if tls:
         kwargs = merge(kwargs, dict(tls=tls, tlsCAFile=str(tls_ca_file)))
-    _client = MongoClient(**kwargs)
+    kwargs = merge(kwargs, pool_options())
+    _client = MongoClient(**kwargs, event_listeners=event_listeners())
     return _client[MONGO_DBNAME]
+
+
+def ensure_unique_index(collection: Collection, key: str):
+    """Make `key` unique in `collection`, replacing a non-unique index on it.
+
+    If existing docs already repeat a `key`, logs that and keeps a non-unique
+    index, so lookups stay indexed until the duplicates are resolved.
+    """
+    name = f"{key}_1"
+    existing = collection.index_information().get(name)
+    if existing and existing.get("unique"):
+        return
+    if existing:
+        try:
+            collection.drop_index(name)
+        except OperationFailure:  # another worker already replaced it
+            pass
+    try:
+        collection.create_index(key, unique=True)
+    except OperationFailure as e:
+        logger.warning(f"Cannot make {collection.name}.{key} unique: {e}")
+        collection.create_index(key)
+
+
+def ensure_indexes(mdb: MongoDatabase):
+    """Create the indexes that route handlers' lookups rely on (no-op if present)."""
+    ensure_unique_index(mdb.terms, "@id")
+    ensure_unique_index(mdb.namespaces, "@id")
+    mdb.arks.create_index("@id")
+    mdb.arks.create_index("_pool", sparse=True)
+    mdb.agents.create_index("id")
+
+
+def acquire_lease(mdb: MongoDatabase, name: str, seconds: float) -> Optional[str]:
+    """Take the lease `name` in `leases` for `seconds`, unless another holder has it.
+
+    Returns the owner token to renew or release the lease with, or None if it is
+    held. A holder that dies loses the lease when `seconds` have passed.
+    """
+    owner = uuid.uuid4().hex
+    now = time.time()
+    try:
+        mdb.leases.find_one_and_update(
+            {"_id": name, "expires_at": {"$not": {"$gt": now}}},
+            {"$set": {"owner": owner, "expires_at": now + seconds}},
+            upsert=True,
+        )
+        return owner
+    except DuplicateKeyError:  # another holder's lease hasn't expired
+        return None
+
+
+def renew_lease(mdb: MongoDatabase, name: str, owner: str, seconds: float) -> bool:
+    """Extend the lease `name` by `seconds` from now. False if `owner` lost it."""
+    rv = mdb.leases.update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"expires_at": time.time() + seconds}},
+    )
+    return rv.matched_count == 1
+
+
+def release_lease(mdb: MongoDatabase, name: str, owner: str):
+    """Give up the lease `name`, if `owner` still holds it."""
+    mdb.leases.update_one(
+        {"_id": name, "owner": owner}, {"$unset": {"owner": "", "expires_at": ""}}
+    )
+
+
+# Fields kept on stored docs for the database's own use, not part of their JSON-LD.
+# `_v` is a revision number and `_modified` the time of the last write, both
+# maintained by writes (see `main.with_version_bump`). `_pool` marks an ARK that
+# is pre-minted but not yet claimed (see `arkpool`). Clients may not write them.
+STORAGE_FIELDS = ("_id", "_v", "_modified", "_pool")
+
+
+def without_storage_fields(doc: dict) -> dict:
+    return dissoc(doc, *STORAGE_FIELDS)
+
+
+def id_prefix_filter(prefix: str, field: str = "@id") -> dict:
+    """Filter for docs whose `field` starts with `prefix`, as an index-friendly range.
+
+    Unlike a `$regex`, `prefix` needs no escaping, and the range can always be
+    answered from an index on `field`.
+    """
+    return {field: {"$gte": prefix, "$lt": prefix[:-1] + chr(ord(prefix[-1]) + 1)}}
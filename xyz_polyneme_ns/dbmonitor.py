@@ -0,0 +1,151 @@
+"""pymongo event listeners that feed command latency and pool health metrics.
+
+Pass `event_listeners()` to `MongoClient`; the metrics are served by `/metrics`.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+from pymongo import monitoring
+
+from xyz_polyneme_ns.metrics import (
+    register_counter,
+    register_gauge,
+    register_histogram,
+)
+
+command_seconds = register_histogram(
+    "mongo_command_seconds",
+    "Latency of MongoDB commands, per collection and command.",
+)
+checkout_wait_seconds = register_histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool.",
+)
+
+
+def _address(address: Tuple[str, int]) -> str:
+    return f"{address[0]}:{address[1]}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        # (connection, request id) -> (collection, command) of in-flight commands
+        self._inflight: Dict[tuple, Tuple[str, str]] = {}
+        self.failures = Counter()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else ""
+        self._inflight[(event.connection_id, event.request_id)] = (
+            collection,
+            event.command_name,
+        )
+
+    def _finished(self, event) -> Tuple[str, str]:
+        collection, command = self._inflight.pop(
+            (event.connection_id, event.request_id), ("", event.command_name)
+        )
+        command_seconds.observe(
+            event.duration_micros / 1e6, collection=collection, command=command
+        )
+        return collection, command
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self.failures[self._finished(event)] += 1
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout waits, connections in use, and checkouts that failed (e.g. timed out).
+
+    A checkout happens on the thread that needs the connection, so the time it
+    started is kept per thread.
+    """
+
+    def __init__(self):
+        self._checkout_started = threading.local()
+        self.checked_out = Counter()
+        self.checkout_failures = Counter()
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.at = time.monotonic()
+
+    def _observe_wait(self, event):
+        started = getattr(self._checkout_started, "at", None)
+        if started is not None:
+            checkout_wait_seconds.observe(
+                time.monotonic() - started, address=_address(event.address)
+            )
+            self._checkout_started.at = None
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        self.checked_out[_address(event.address)] += 1
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        self.checkout_failures[(_address(event.address), event.reason)] += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out[_address(event.address)] -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+command_metrics = CommandMetrics()
+pool_metrics = PoolMetrics()
+
+
+def event_listeners():
+    return [command_metrics, pool_metrics]
+
+
+register_counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that returned an error, per collection and command.",
+    lambda: (
+        ({"collection": collection, "command": command}, n)
+        for (collection, command), n in list(command_metrics.failures.items())
+    ),
+)
+register_gauge(
+    "mongo_pool_checked_out_connections",
+    "Connections currently checked out of the pool, per server.",
+    lambda: (
+        ({"address": address}, n)
+        for address, n in list(pool_metrics.checked_out.items())
+    ),
+)
+register_counter(
+    "mongo_pool_checkout_failures_total",
+    "Connection checkouts that failed, per server and reason (e.g. timeout).",
+    lambda: (
+        ({"address": address, "reason": reason}, n)
+        for (address, reason), n in list(pool_metrics.checkout_failures.items())
+    ),
+)
@@ -0,0 +1,267 @@
+"""A read-through cache of term and skolem docs, and of their serializations.
+
+Hot docs are served from memory instead of a `find_one` and a graph round trip
+per read. The cache is bounded by (an estimate of) the bytes it holds, evicting
+the least recently used docs first.
+
+Writes call `invalidate`, which drops the doc here at once and records the key in
+`doc_cache_invalidations`. Every worker follows that collection, with a change
+stream where the deployment offers one and by polling it otherwise, and drops
+the keys it sees. Other workers may thus serve a stale doc for up to
+`DOC_CACHE_POLL_SECONDS` after a write, or only briefly with a change stream.
+A change stream that fails is resumed where it left off, or if that is no longer
+possible, the whole cache is dropped.
+Other in-process caches keyed the same way (e.g. the redirect index) can follow
+along with `on_discard`.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from bson import ObjectId
+from pymongo.database import Database as MongoDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from xyz_polyneme_ns.metrics import register_counter, register_gauge
+
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES") or 64 * 1024 * 1024)
+DOC_CACHE_POLL_SECONDS = float(os.getenv("DOC_CACHE_POLL_SECONDS") or 1)
+# How long invalidations are kept for workers to see (via a TTL index).
+DOC_CACHE_INVALIDATION_TTL_SECONDS = 3600
+# Polls re-read invalidations this far back from the latest seen, for ones that
+# were stamped earlier but written later (e.g. by a worker on a lagging clock).
+DOC_CACHE_POLL_OVERLAP_SECONDS = 10
+# Raised by a change stream that can't be resumed from its token any more.
+CHANGE_STREAM_HISTORY_LOST = 286
+
+logger = logging.getLogger(__name__)
+
+
+class CachedBody(NamedTuple):
+    body: bytes
+    media_type: str
+
+
+class _Entry(NamedTuple):
+    doc: dict
+    bodies: Dict[Optional[str], CachedBody]  # by Accept header
+    size: int
+
+
+def _doc_size(doc: dict) -> int:
+    return len(json.dumps(doc, default=str))
+
+
+class DocCache:
+    def __init__(self, max_bytes: int = DOC_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        # Bumped on every invalidation. Read it before loading a doc to `put`, so
+        # a load that raced an invalidation is not cached.
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._discard_listeners: List[Callable[[str], None]] = []
+
+    def on_discard(self, listener: Callable[[str], None]):
+        """Call `listener(key)` whenever `key` is discarded, here or by another worker."""
+        self._discard_listeners.append(listener)
+
+    def _set(self, key: str, entry: _Entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.doc
+
+    def get_or_load(
+        self, key: str, load: Callable[[], Optional[dict]]
+    ) -> Optional[dict]:
+        """The doc for `key`, calling `load()` for it if it isn't cached.
+
+        Missing docs (`load()` returns None) are not cached.
+        """
+        doc = self.get(key)
+        if doc is not None:
+            return doc
+        generation = self.generation
+        doc = load()
+        if doc is not None:
+            self.put(key, doc, generation)
+        return doc
+
+    def put(self, key: str, doc: dict, generation: Optional[int] = None):
+        """Cache `doc`, unless an invalidation came after `generation` was read."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._set(key, _Entry(doc=doc, bodies={}, size=_doc_size(doc)))
+
+    def body(self, key: str, doc: dict, accept: Optional[str]) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.doc is not doc:
+                return None
+            return entry.bodies.get(accept)
+
+    def put_body(self, key: str, doc: dict, accept: Optional[str], body: CachedBody):
+        """Cache `body` as `doc` served for `accept`, if `doc` is still cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.doc is not doc or accept in entry.bodies:
+                return
+            self._set(
+                key,
+                _Entry(
+                    doc=doc,
+                    bodies={**entry.bodies, accept: body},
+                    size=entry.size + len(body.body),
+                ),
+            )
+
+    def clear(self):
+        """Drop every entry, e.g. after missing invalidations."""
+        with self._lock:
+            self.generation += 1
+            keys = list(self._entries)
+            self._entries.clear()
+            self.size = 0
+        for key in keys:
+            for listener in self._discard_listeners:
+                listener(key)
+
+    def discard(self, key: str):
+        with self._lock:
+            self.generation += 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry.size
+        for listener in self._discard_listeners:
+            listener(key)
+
+    def invalidate(self, mdb: MongoDatabase, key: str):
+        """Drop `key` here, and have every other worker drop it."""
+        self.discard(key)
+        mdb.doc_cache_invalidations.insert_one(
+            {"key": key, "at": datetime.now(tz=timezone.utc)}
+        )
+
+    def poll_invalidations(
+        self, mdb: MongoDatabase, since: datetime, seen: Dict[ObjectId, datetime]
+    ) -> datetime:
+        """Discard keys invalidated at or after `since`, less an overlap.
+
+        Invalidations are matched by time, not by `_id`: the ObjectIds of
+        different workers don't sort in the order they were written. `seen`
+        holds the invalidations already applied from the overlap, so they aren't
+        applied again. Returns the `since` for the next poll.
+        """
+        overlap = timedelta(seconds=DOC_CACHE_POLL_OVERLAP_SECONDS)
+        for d in mdb.doc_cache_invalidations.find({"at": {"$gte": since - overlap}}):
+            at = d["at"].replace(tzinfo=timezone.utc)
+            if d["_id"] not in seen:
+                self.discard(d["key"])
+                seen[d["_id"]] = at
+            since = max(since, at)
+        for _id in [_id for _id, at in seen.items() if at < since - overlap]:
+            del seen[_id]
+        return since
+
+    def _watch_invalidations(self, mdb: MongoDatabase):
+        """Apply invalidations from a change stream, resuming it after errors.
+
+        Returns only if the deployment offers no change streams.
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume_token = None
+        while True:
+            try:
+                with mdb.doc_cache_invalidations.watch(
+                    pipeline, resume_after=resume_token
+                ) as stream:
+                    while stream.alive:
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self.discard(change["fullDocument"]["key"])
+            except PyMongoError as e:
+                if resume_token is None:
+                    logger.info(f"No change stream of doc cache invalidations: {e}")
+                    return
+                if (
+                    isinstance(e, OperationFailure)
+                    and e.code == CHANGE_STREAM_HISTORY_LOST
+                ):
+                    logger.warning("Missed doc cache invalidations, clearing the cache")
+                    self.clear()
+                    resume_token = None
+                    continue
+                logger.warning(f"Doc cache invalidations stream failed, resuming: {e}")
+                time.sleep(DOC_CACHE_POLL_SECONDS)
+
+    def _follow_invalidations(self, mdb: MongoDatabase, interval: float):
+        since, seen = datetime.now(tz=timezone.utc), {}
+        self._watch_invalidations(mdb)
+        logger.info(f"Polling doc cache invalidations every {interval}s")
+        while True:
+            time.sleep(interval)
+            try:
+                since = self.poll_invalidations(mdb, since, seen)
+            except PyMongoError as e:
+                logger.warning(f"Could not poll doc cache invalidations: {e}")
+
+    def follow_invalidations(
+        self, mdb: MongoDatabase, interval: float = DOC_CACHE_POLL_SECONDS
+    ):
+        """Apply other workers' invalidations from a daemon thread."""
+        threading.Thread(
+            target=self._follow_invalidations,
+            args=(mdb, interval),
+            name="doc-cache-invalidations",
+            daemon=True,
+        ).start()
+
+
+def ensure_invalidations_index(mdb: MongoDatabase):
+    mdb.doc_cache_invalidations.create_index(
+        "at", expireAfterSeconds=DOC_CACHE_INVALIDATION_TTL_SECONDS
+    )
+
+
+doc_cache = DocCache()
+
+register_gauge(
+    "doc_cache_bytes",
+    "Estimated size of the term and skolem docs (and serializations) cached.",
+    lambda: [({}, doc_cache.size)],
+)
+register_counter(
+    "doc_cache_lookups_total",
+    "Term and skolem doc cache lookups, by result.",
+    lambda: [
+        ({"result": "hit"}, doc_cache.hits),
+        ({"result": "miss"}, doc_cache.misses),
+    ],
+)
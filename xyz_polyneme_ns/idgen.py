@@ -1,12 +1,16 @@
 import csv
 import os
 from collections import defaultdict
-from functools import lru_cache
 import re
+from typing import List, Tuple
 
 import base32_lib as base32
 from pydantic import HttpUrl, ValidationError, BaseModel, constr
+from pymongo import ReturnDocument
 from pymongo.database import Database as MongoDatabase
+from pymongo.errors import DuplicateKeyError
+
+from xyz_polyneme_ns.db import id_prefix_filter
 
 
 def generate_id(length=10, split_every=4, checksum=True) -> str:
@@ -59,31 +63,64 @@ def encode_id(number: int, split_every=4, min_length=10, checksum=True) -> int:
     )
 
 
-@lru_cache
-def ark_map(mdb: MongoDatabase, naan: int = 57802):
-    return {
-        d["_id"]: d.get("_t")
-        for d in mdb.arks.find({"_id": {"$regex": rf"^ark:{naan}"}}, ["_t"])
-    }
-
-
-@lru_cache
-def ark_naan_shoulder_map(mdb: MongoDatabase):
-    return {d["_id"]: set(d["shoulders"]) for d in mdb.naans.find({}, ["shoulders"])}
-
-
 ark_basename = re.compile(rf"ark:[^/]+/([^/]+)")
 
 
-@lru_cache
-def existing_basenames(mdb: MongoDatabase, naan: int = 57802):
-    return {ark.split("/")[1].split(".", maxsplit=1)[0] for ark in ark_map(mdb, naan)}
-
-
 # sping: "semi-opaque string" (https://n2t.net/e/n2t_apidoc.html).
 SPING_SIZE_THRESHOLDS = [(n, (2 ** (5 * n)) // 2) for n in [2, 4, 6, 8, 10]]
 
 
+def next_ark_count(mdb: MongoDatabase, naan: int, shoulder: str, n: int = 1) -> int:
+    """Atomically count `n` more ARKs minted under `naan` + `shoulder`.
+
+    The counter for a shoulder is seeded, on first use, from the number of ARKs
+    already on that shoulder.
+    """
+    ark_to_shoulder = f"ark:{naan}/{shoulder}"
+    for _ in range(2):
+        counter = mdb.ark_counters.find_one_and_update(
+            {"_id": ark_to_shoulder},
+            {"$inc": {"n": n}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if counter is not None:
+            return counter["n"]
+        n_existing = mdb.arks.count_documents(
+            id_prefix_filter(ark_to_shoulder, field="_id")
+        )
+        try:
+            mdb.ark_counters.insert_one({"_id": ark_to_shoulder, "n": n_existing})
+        except DuplicateKeyError:
+            pass  # another process seeded it first
+    raise RuntimeError(f"Could not count ARKs for {ark_to_shoulder}")
+
+
+def blade_length(n_arks: int) -> int:
+    """Sping length for the `n_arks`-th ARK on a shoulder."""
+    return next((n for n, t in SPING_SIZE_THRESHOLDS if n_arks < t), 12)
+
+
+def blade_length_runs(first: int, last: int) -> List[Tuple[int, int]]:
+    """(sping length, number of ARKs) runs for the `first`- to `last`-th ARKs."""
+    runs = []
+    for n_arks in range(first, last + 1):
+        n_chars = blade_length(n_arks)
+        if runs and runs[-1][0] == n_chars:
+            runs[-1] = (n_chars, runs[-1][1] + 1)
+        else:
+            runs.append((n_chars, 1))
+    return runs
+
+
+def generate_ark_bons(naan: int, shoulder: str, n: int, n_chars: int) -> List[str]:
+    """Generate `n` distinct candidate BONs for naan + shoulder, without persisting them."""
+    bons = set()
+    while len(bons) < n:
+        blade = generate_id(length=(n_chars + 2), split_every=0, checksum=True)
+        bons.add(f"ark:{naan}/{shoulder}{blade}")
+    return list(bons)
+
+
 def create_ark_bon(
     mdb: MongoDatabase,
     naan: int = 57802,
@@ -91,22 +128,16 @@ def create_ark_bon(
 ) -> str:
     """Create and persist a new ARK Base Object Name (BON) for ARK naan + shoulder.
 
-    Generates a unique, as-short-as-reasonable Crockford Base32-encoded ID.
+    Generates a unique, as-short-as-reasonable Crockford Base32-encoded ID. The
+    unique `_id` index on `arks` settles collisions, including between concurrent
+    creators, so a colliding blade is simply regenerated.
     """
-    ark_to_shoulder = f"ark:{naan}/{shoulder}"
-    existing_blades = {
-        a.split(ark_to_shoulder, maxsplit=1)[1]
-        for a in mdb.arks.distinct("_id", {"_id": {"$regex": rf"^{ark_to_shoulder}"}})
-    }
-    n_chars = next(
-        (n for n, t in SPING_SIZE_THRESHOLDS if (1 + len(existing_blades)) < t),
-        12,
-    )
+    n_chars = blade_length(next_ark_count(mdb, naan, shoulder))
     while True:
         blade = generate_id(length=(n_chars + 2), split_every=0, checksum=True)
         bon = f"ark:{naan}/{shoulder}{blade}"
-        taken = mdb.arks.find_one({"_id": {"$regex": rf"^{bon}"}}, ["_id"]) is not None
-        if not taken:
+        try:
             mdb.arks.insert_one({"_id": bon})
-            break
-    return bon
+            return bon
+        except DuplicateKeyError:
+            continue
@@ -5,34 +5,106 @@ import json
 
 import re
 
-from datetime import datetime
+from datetime import datetime, timezone
 
+import asyncio
 import csv
 import os
+import math
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from anyio import to_thread
 from jinja2 import Environment, PackageLoader, select_autoescape
 from pymongo.results import DeleteResult
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import PlainTextResponse
 from toolz import dissoc, assoc, merge
-from typing import Optional, List, Union
+from typing import Callable, Iterable, List, Optional, Union
 
 from fastapi import FastAPI, Request, Response, Header, Depends, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
+from fastapi.security import HTTPBasicCredentials
 import rdflib
 from rdflib import Graph, RDF, OWL, SKOS, RDFS, DCTERMS, DCAT
-from pymongo import ReplaceOne
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from pymongo.database import Database as MongoDatabase
 
-from xyz_polyneme_ns.auth import get_current_agent, get_password_hash
-from xyz_polyneme_ns.db import mongo_db
+from xyz_polyneme_ns.arkmap import load_ark_map
+from xyz_polyneme_ns.arkpool import claim_ark, keep_pools_filled, pool_depths
+from xyz_polyneme_ns.auth import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    authenticate_agent,
+    create_access_token,
+    get_current_agent,
+    get_password_hash,
+    security,
+    warn_if_no_tokens,
+)
+from xyz_polyneme_ns.cache import (
+    MISSING,
+    ResponseCache,
+    TTLCache,
+    etag_matches,
+    http_date,
+    make_etag,
+    not_modified,
+)
+from xyz_polyneme_ns.db import (
+    mongo_db,
+    ensure_indexes,
+    id_prefix_filter,
+    acquire_lease,
+    release_lease,
+    renew_lease,
+    STORAGE_FIELDS,
+    without_storage_fields,
+)
+from xyz_polyneme_ns.doccache import (
+    CachedBody,
+    doc_cache,
+    ensure_invalidations_index,
+)
+from xyz_polyneme_ns.metrics import register_gauge, render_metrics
+from xyz_polyneme_ns.mirror import remote_mirror
+from xyz_polyneme_ns.negotiation import (
+    HTML,
+    N_QUADS,
+    NDJSON,
+    Serialization,
+    acceptable,
+)
+from xyz_polyneme_ns.redirects import (
+    RedirectMiddleware,
+    redirect_index,
+    shoulder_forwards,
+)
+from xyz_polyneme_ns.registry import naan_registry
+from xyz_polyneme_ns.snapshots import (
+    SNAPSHOT_PUBLISH_LEASE_SECONDS,
+    entry_doc,
+    keep_published,
+    snapshot_store,
+)
+from xyz_polyneme_ns.streaming import (
+    NAMESPACE_STREAM_BATCH_SIZE,
+    stream_namespace,
+    streamable,
+)
 from xyz_polyneme_ns.util import register_prefixed_path_url_converter
 from xyz_polyneme_ns.idgen import (
-    ark_map,
-    ark_naan_shoulder_map,
+    blade_length,
     create_ark_bon,
+    generate_ark_bons,
+    next_ark_count,
 )
 from xyz_polyneme_ns.models import (
     Doc,
@@ -49,10 +121,11 @@ from xyz_polyneme_ns.models import (
 )
 from xyz_polyneme_ns.util import (
     REPO_ROOT_DIR,
-    pick,
     now,
     raise404_if_none,
+    read_json_docs,
 )
+from xyz_polyneme_ns.vocabs import agu_index, agu_term_graph
 
 tags_metadata = [
     {
@@ -79,9 +152,15 @@ app = FastAPI(
     openapi_tags=tags_metadata,
 )
 
+# Handlers that call pymongo or rdflib are plain `def`s, which FastAPI runs in a
+# worker thread pool so that blocking calls don't stall the event loop. Only
+# handlers that do no I/O (e.g. redirects) are `async def`.
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE") or 40)
 
 API_HOST = os.getenv("API_HOST")
 
+app.add_middleware(RedirectMiddleware, api_host=API_HOST)
+
 DEFAULT_JSONLD_CONTEXT = {
     "dct": "http://purl.org/dc/terms/",
     "skos": "http://www.w3.org/2004/02/skos/core#",
@@ -104,28 +183,6 @@ def ensure_context(d):
     return d
 
 
-def sorted_media_types(accept: str) -> List[str]:
-    """
-    Example `accept`: "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8".
-    """
-    alternatives = [a.split(";") for a in accept.split(",")]
-    for a in alternatives:
-        # provide default relative quality factor
-        # https://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html
-        if len(a) == 1:
-            a.append("q=1")
-        # ignore accept-params other than the relative quality factor
-        for i, element in enumerate(a):
-            if "=" in element and not element.startswith("q"):
-                a.pop(i)
-    alternatives = sorted(
-        [(type_, float(qexpr[2:])) for type_, qexpr in alternatives],
-        key=lambda a: a[1],
-        reverse=True,
-    )
-    return [a[0] for a in alternatives]
-
-
 def html_able(g: rdflib.Graph) -> bool:
     return (
         g.value(predicate=RDF.type, object=OWL.Ontology)
@@ -134,49 +191,108 @@ def html_able(g: rdflib.Graph) -> bool:
     )
 
 
-def _get_label(subject, g: rdflib.Graph) -> str:
-    return g.value(subject=subject, predicate=SKOS.prefLabel) or g.value(
-        subject=subject, predicate=RDFS.label
-    )
-
+TERM_CARD_PREDICATES = {
+    SKOS.prefLabel,
+    RDFS.label,
+    SKOS.definition,
+    RDFS.comment,
+    RDFS.isDefinedBy,
+}
 
-def _get_definition(subject, g: rdflib.Graph) -> str:
-    return g.value(subject=subject, predicate=SKOS.definition) or g.value(
-        subject=subject, predicate=RDFS.comment
-    )
 
+def term_cards_for(ns, g: rdflib.Graph) -> List[dict]:
+    """Label and definition of each term defined by `ns`, from one pass over `g`.
 
-def make_ns_html(g: rdflib.Graph) -> str:
-    ns = g.value(predicate=RDF.type, object=OWL.Ontology) or g.value(
-        predicate=RDF.type, object=SKOS.ConceptScheme
-    )
-    title = g.value(subject=ns, predicate=DCTERMS.title)
-    terms = g.subjects(predicate=RDFS.isDefinedBy, object=ns)
+    A label is the skos:prefLabel, else the rdfs:label; a definition is the
+    skos:definition, else the rdfs:comment.
+    """
+    values = defaultdict(dict)
+    defined_by_ns = set()
+    for s, p, o in g:
+        if p not in TERM_CARD_PREDICATES:
+            continue
+        if p == RDFS.isDefinedBy:
+            if o == ns:
+                defined_by_ns.add(s)
+        else:
+            values[s].setdefault(p, o)
     term_cards = []
-    for t in terms:
+    for t in defined_by_ns:
+        v = values[t]
         term_cards.append(
             {
                 "url": str(t),
-                "label": _get_label(subject=t, g=g),
-                "definition": _get_definition(subject=t, g=g),
+                "label": v.get(SKOS.prefLabel) or v.get(RDFS.label),
+                "definition": v.get(SKOS.definition) or v.get(RDFS.comment),
             }
         )
-    term_cards = sorted(term_cards, key=itemgetter("label"))
+    return sorted(term_cards, key=itemgetter("label"))
+
+
+def make_ns_html(g: rdflib.Graph) -> str:
+    ns = g.value(predicate=RDF.type, object=OWL.Ontology) or g.value(
+        predicate=RDF.type, object=SKOS.ConceptScheme
+    )
+    title = g.value(subject=ns, predicate=DCTERMS.title)
+    term_cards = term_cards_for(ns, g)
 
     template = jinja_env.get_template("namespace.html")
     return template.render(title=title, term_cards=term_cards)
 
 
+DISTRIBUTION_FETCH_WORKERS = int(os.getenv("DISTRIBUTION_FETCH_WORKERS") or 8)
+DISTRIBUTION_FETCH_TIMEOUT = float(os.getenv("DISTRIBUTION_FETCH_TIMEOUT") or 5)
+DISTRIBUTION_CACHE_TTL = float(os.getenv("DISTRIBUTION_CACHE_TTL") or 600)
+DISTRIBUTION_FAILURE_TTL = float(os.getenv("DISTRIBUTION_FAILURE_TTL") or 60)
+
+distribution_cache = TTLCache(maxsize=4096, ttl=DISTRIBUTION_CACHE_TTL)
+# Distributions whose last fetch failed, so pages don't wait on them every view.
+distribution_failures = TTLCache(maxsize=4096, ttl=DISTRIBUTION_FAILURE_TTL)
+distribution_session = requests.Session()
+distribution_session.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_maxsize=DISTRIBUTION_FETCH_WORKERS),
+)
+distribution_session.mount(
+    "http://",
+    requests.adapters.HTTPAdapter(pool_maxsize=DISTRIBUTION_FETCH_WORKERS),
+)
+distribution_fetch_pool = ThreadPoolExecutor(
+    max_workers=DISTRIBUTION_FETCH_WORKERS, thread_name_prefix="distribution-fetch"
+)
+
+
+def fetch_distribution_ttl(uri: str) -> Optional[str]:
+    """Turtle metadata for distribution `uri`, or None if it could not be fetched."""
+    if (d_ttl := distribution_cache.get(uri)) is not None:
+        return d_ttl
+    if distribution_failures.get(uri):
+        return None
+    try:
+        rv = distribution_session.get(
+            uri, headers={"Accept": "text/turtle"}, timeout=DISTRIBUTION_FETCH_TIMEOUT
+        )
+        rv.raise_for_status()
+    except requests.RequestException:
+        distribution_failures.set(uri, True)
+        return None
+    distribution_cache.set(uri, rv.text)
+    return rv.text
+
+
 def make_dataset_html(g: rdflib.Graph) -> str:
     ds = g.value(predicate=RDF.type, object=DCAT.Dataset)
     title = g.value(subject=ds, predicate=DCTERMS.title)
     description = g.value(subject=ds, predicate=DCTERMS.description)
     issued = g.value(subject=ds, predicate=DCTERMS.issued)
-    distributions = g.objects(subject=ds, predicate=DCAT.distribution)
+    distributions = list(g.objects(subject=ds, predicate=DCAT.distribution))
+    d_ttls = distribution_fetch_pool.map(
+        fetch_distribution_ttl, [str(d) for d in distributions]
+    )
     dist_cards = []
-    for d in distributions:
-        d_ttl = requests.get(str(d), headers={"Accept": "text/turtle"}).text
-        g.parse(data=d_ttl, format="turtle")
+    for d, d_ttl in zip(distributions, d_ttls):
+        if d_ttl is not None:
+            g.parse(data=d_ttl, format="turtle")
         dist_cards.append(
             {
                 "id": str(d),
@@ -185,7 +301,6 @@ def make_dataset_html(g: rdflib.Graph) -> str:
             }
         )
     dist_cards = sorted(dist_cards, key=itemgetter("id"))
-    print(dist_cards)
 
     template = jinja_env.get_template("dataset.html")
     return template.render(
@@ -200,36 +315,224 @@ def make_html(g: rdflib.Graph) -> str:
         return make_ns_html(g)
 
 
+def response_as(
+    g: rdflib.Graph, serialization: Optional[Serialization]
+) -> Optional[Response]:
+    """Response for `g` rendered as `serialization`, or None if it can't be rendered so.
+
+    A `serialization` of None renders the plain-text Turtle fallback.
+    """
+    if serialization is None:
+        return PlainTextResponse(content=g.serialize(format="turtle"), status_code=200)
+    if serialization == HTML:
+        return HTMLResponse(content=make_html(g)) if html_able(g) else None
+    return Response(
+        content=g.serialize(
+            encoding="utf-8", format=serialization.format, auto_compact=True
+        ).decode("utf-8"),
+        media_type=serialization.media_type,
+    )
+
+
 def response_for(g: rdflib.Graph, accept: str):
-    types_ = sorted_media_types(accept)
-    for media_type in types_:
-        if media_type == "text/html" and html_able(g):
-            return HTMLResponse(content=make_html(g))
-        else:
-            try:
-                return Response(
-                    content=g.serialize(
-                        encoding="utf-8", format=media_type, auto_compact=True
-                    ).decode("utf-8"),
-                    media_type=media_type,
-                )
-            except rdflib.plugin.PluginException:
-                continue
+    for serialization in acceptable(accept):
+        if (rv := response_as(g, serialization)) is not None:
+            return rv
     else:
-        return PlainTextResponse(content=g.serialize(format="turtle"), status_code=200)
+        return response_as(g, None)
+
+
+static_response_cache = ResponseCache()
+
+
+def cached_response_for(
+    route: str,
+    version: str,
+    load_graph: Callable[[], rdflib.Graph],
+    accept: str,
+    if_none_match: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+):
+    """Like `response_for`, but serves bodies already rendered for this `version`.
+
+    `load_graph` is called only if some candidate media type has not yet been
+    rendered for `version`. Responses carry ETag and Last-Modified headers, and a
+    matching `if_none_match` gets a 304.
+    """
+    g = None
+    for serialization in acceptable(accept) + (None,):
+        media_type = serialization and serialization.media_type
+        entry = static_response_cache.get(route, version, media_type)
+        if entry is MISSING:
+            if g is None:
+                g = load_graph()
+            rv = response_as(g, serialization)
+            entry = static_response_cache.put(
+                route,
+                version,
+                media_type,
+                body=rv and rv.body,
+                response_media_type=rv and rv.media_type,
+                last_modified=last_modified,
+            )
+        if entry is not None:
+            break
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Vary": "Accept",
+    }
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+
+NAMESPACE_HTML_CACHE_SIZE = int(os.getenv("NAMESPACE_HTML_CACHE_SIZE") or 256)
+
+# namespace @id -> (`doc_revision` of the namespace, rendered page). A write to a
+# namespace or its terms makes a new revision, as does re-creating it, so a stale
+# page is never served. Deleting a namespace drops its page.
+namespace_html_cache = TTLCache(maxsize=NAMESPACE_HTML_CACHE_SIZE, ttl=math.inf)
+
+
+def first_revision() -> dict:
+    return {"_v": 1, "_modified": now()}
+
+
+def with_version_bump(update: dict) -> dict:
+    """`update`, also bumping the doc's revision (`_v`) and setting `_modified`."""
+    return merge(
+        update,
+        {
+            "$inc": merge(update.get("$inc", {}), {"_v": 1}),
+            "$set": merge(update.get("$set", {}), {"_modified": now()}),
+        },
+    )
+
+
+def bump_namespace_version(mdb: MongoDatabase, ns_uri: str):
+    """Record a write to a namespace's terms as a new revision of the namespace."""
+    mdb.namespaces.update_one({"@id": ns_uri}, with_version_bump({}))
+
+
+CLOSED_MONTH_MAX_AGE = int(os.getenv("CLOSED_MONTH_MAX_AGE") or 31_536_000)
+
+
+def _modified_at(doc: dict) -> Optional[datetime]:
+    modified = doc.get("_modified")
+    if modified is not None and modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    return modified
+
+
+def doc_revision(doc: dict) -> str:
+    """The doc's revision number and the time of its last write.
+
+    `_v` restarts at 1 when a deleted doc is created again, but `_modified` does
+    not repeat, so together they identify what the doc held.
+    """
+    modified = _modified_at(doc)
+    return f"{doc.get('_v', 0)}|{modified and modified.isoformat()}"
+
+
+def doc_validators(doc: dict, accept: Optional[str]) -> dict:
+    """ETag and Last-Modified for `doc` as negotiated for `accept`.
+
+    Derived from the doc's revision alone, so a 304 needs no serialization.
+    """
+    version = f"{doc['@id']}|{doc_revision(doc)}|{accept}"
+    headers = {"ETag": make_etag(version.encode()), "Vary": "Accept"}
+    if (modified := _modified_at(doc)) is not None:
+        headers["Last-Modified"] = http_date(modified)
+    return headers
+
+
+def month_cache_control(year: int, month: int) -> dict:
+    """Docs dated in a closed month can no longer change (see `check_too_late`)."""
+    if is_closed_month(year, month):
+        return {"Cache-Control": f"public, max-age={CLOSED_MONTH_MAX_AGE}, immutable"}
+    return {"Cache-Control": "no-cache"}
+
+
+def conditional_response(
+    headers: dict,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    make_response: Callable[[], Response],
+) -> Response:
+    """304 if the client's copy is current, else `make_response()`; with `headers`."""
+    if not_modified(headers, if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    rv = make_response()
+    rv.headers.update(headers)
+    return rv
+
+
+def namespace_html_response(
+    mdb: MongoDatabase, ns_doc: dict, term_docs_filter: dict, accept: Optional[str]
+):
+    """HTML for a namespace, rendered once per version of the namespace."""
+    revision = doc_revision(ns_doc)
+    cached = namespace_html_cache.get(ns_doc["@id"])
+    if cached is not None and cached[0] == revision:
+        entry = cached[1]
+    else:
+        docs = [ns_doc] + list(mdb.terms.find(term_docs_filter))
+        g = Graph().parse(
+            data=json.dumps([ensure_context(without_storage_fields(d)) for d in docs]),
+            format="json-ld",
+        )
+        if not html_able(g):
+            return response_for(g, accept)
+        entry = make_ns_html(g).encode("utf-8")
+        namespace_html_cache.set(ns_doc["@id"], (revision, entry))
+    return HTMLResponse(content=entry)
+
+
+def snapshot_response(
+    entry: dict,
+    year: int,
+    month: int,
+    accept: Optional[str],
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> Optional[Response]:
+    """The published snapshot `entry` as a file, if it holds the preferred format.
+
+    Validators are those the doc itself would get, so they hold across publishing.
+    """
+    preferred = next(iter(acceptable(accept)), None)
+    if preferred is None or preferred.media_type not in entry["artifacts"]:
+        return None
+    path = snapshot_store.object_path(entry["artifacts"][preferred.media_type])
+    if not path.exists():
+        return None
+    headers = merge(
+        doc_validators(entry_doc(entry), accept), month_cache_control(year, month)
+    )
+    return conditional_response(
+        headers,
+        if_none_match,
+        if_modified_since,
+        lambda: FileResponse(path, media_type=preferred.media_type),
+    )
 
 
 def check_naan(mdb: MongoDatabase, naan: ArkNaan):
-    if mdb.naans.find_one({"_id": naan}) is None:
+    if not naan_registry.has_naan(mdb, naan):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"This server is not a name mapping authority for ark naan {naan}",
         )
 
 
-def check_too_late(year, month):
+def is_closed_month(year, month) -> bool:
     dt_now: datetime = now()
-    if (year < dt_now.year) or (year == dt_now.year and month < dt_now.month):
+    return (year < dt_now.year) or (year == dt_now.year and month < dt_now.month)
+
+
+def check_too_late(year, month):
+    if is_closed_month(year, month):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Cannot update namespaces dated earlier than the current month",
@@ -256,11 +559,21 @@ def check_can_update_skolem(agent: Agent, shoulder: ArkShoulder):
 
 
 def check_shoulder_registered(mdb: MongoDatabase, naan: ArkNaan, shoulder: ArkShoulder):
-    shoulders = ark_naan_shoulder_map(mdb)[naan]
+    shoulders = naan_registry.shoulders(mdb, naan)
     if shoulder not in shoulders:
         raise ValueError(
             f"Shoulder {shoulder} is not registered for naan {naan} "
-            f"(must be one of {shoulders})."
+            f"(must be one of {sorted(shoulders)})."
+        )
+
+
+def check_no_storage_fields(fields: Iterable[str]):
+    """Reject writes to fields kept for the database's own use (`STORAGE_FIELDS`)."""
+    reserved = sorted({f for f in fields if f.split(".")[0] in STORAGE_FIELDS})
+    if reserved:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Fields {reserved} are reserved and may not be written.",
         )
 
 
@@ -311,23 +624,122 @@ def unset_equivalences():
     }
 
 
+def updated_fields(update: dict) -> List[str]:
+    """The field paths that the Mongo update `update` writes to.
+
+    These are the paths under each operator, and for `$rename` also the targets.
+    """
+    paths = []
+    for operator, fields in update.items():
+        if not isinstance(fields, dict):
+            continue
+        paths.extend(fields)
+        if operator == "$rename":
+            paths.extend(v for v in fields.values() if isinstance(v, str))
+    return paths
+
+
+def with_equivalences_unset(update: dict) -> Optional[dict]:
+    """`update`, merged with `unset_equivalences()` so that one write does both.
+
+    Equivalences that `update` replaces outright (`$set` of the whole field, or
+    `$unset`) are left to it, as if the unset had been applied first. If `update`
+    writes into one instead (e.g. `$push`, `$addToSet`, a `field.0` path, or a
+    `$rename` from or to one), the result would depend on the old value or
+    conflict with the unset, so None is returned: the unset must be applied
+    first, as its own write.
+    """
+    equivalences = unset_equivalences()["$unset"]
+    touched = set()
+    for operator, fields in update.items():
+        if not isinstance(fields, dict):
+            continue
+        paths = list(fields)
+        if operator == "$rename":  # its targets are written too
+            paths.extend(v for v in fields.values() if isinstance(v, str))
+        for path in paths:
+            field = path.split(".")[0]
+            if field not in equivalences:
+                continue
+            if operator not in ("$set", "$unset") or path != field:
+                return None
+            touched.add(field)
+    unset = {k: v for k, v in equivalences.items() if k not in touched}
+    return merge(update, {"$unset": merge(unset, update.get("$unset", {}))})
+
+
+def update_doc_or_422(collection, filter_: dict, update: dict) -> Optional[dict]:
+    """Apply `update` and return the updated doc (None if there's no such doc)."""
+    try:
+        return collection.find_one_and_update(
+            filter_, update, return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"mongo update api: {e}",
+        )
+
+
+def update_doc_clearing_equivalences(
+    collection, filter_: dict, update: dict
+) -> Optional[dict]:
+    """Clear the doc's equivalences, then apply `update`; in one write if possible."""
+    merged = with_equivalences_unset(update)
+    if merged is not None:
+        return update_doc_or_422(collection, filter_, merged)
+    if collection.update_one(filter_, unset_equivalences()).matched_count == 0:
+        return None
+    return update_doc_or_422(collection, filter_, update)
+
+
 def load_graph_from_file(filename: Union[Path, str], format_=None) -> rdflib.Graph:
     g = rdflib.Graph()
     g.parse(str(filename), format=format_)
     return g
 
 
-def jsonld_doc_response(jsonld_doc, accept):
-    jsonld_doc = dissoc(jsonld_doc, "_id")
+def jsonld_docs_response(jsonld_docs: List[dict], accept):
+    """Response for stored JSON-LD docs.
+
+    If JSON-LD is the preferred available format, the stored docs are returned as
+    is, skipping the round trip through an rdflib Graph: a single doc by itself,
+    or several as a top-level `@graph` of docs that each keep their `@context`.
+    """
+    jsonld_docs = [ensure_context(without_storage_fields(d)) for d in jsonld_docs]
+    preferred = next(iter(acceptable(accept)), None)
+    if preferred is not None and preferred.media_type == "application/ld+json":
+        content = jsonld_docs[0] if len(jsonld_docs) == 1 else {"@graph": jsonld_docs}
+        return Response(
+            content=json.dumps(content, indent=2),
+            media_type="application/ld+json",
+        )
     g = Graph()
-    g.parse(data=json.dumps(jsonld_doc), format="json-ld")
+    g.parse(data=json.dumps(jsonld_docs), format="json-ld")
     return response_for(g, accept)
 
 
+def jsonld_doc_response(jsonld_doc, accept):
+    return jsonld_docs_response([jsonld_doc], accept)
+
+
+def cached_doc_response(key: str, doc: dict, accept: Optional[str]) -> Response:
+    """Like `jsonld_doc_response`, but keeps the body with `doc` in `doc_cache`."""
+    cached = doc_cache.body(key, doc, accept)
+    if cached is None:
+        rv = jsonld_doc_response(doc, accept)
+        cached = CachedBody(body=rv.body, media_type=rv.media_type)
+        doc_cache.put_body(key, doc, accept, cached)
+    return Response(content=cached.body, media_type=cached.media_type)
+
+
 QUERY_EVAL_ONTOLOGY_URL = "https://w3id.org/lode/owlapi/https://raw.githubusercontent.com/polyneme/ads-query-eval/main/query-eval.ttl"
 
 
 def fwd_57802_pfx(pfx, api_host="https://svc.polyneme.xyz"):
+    # Served by `RedirectMiddleware`; the route remains for the OpenAPI docs.
+    shoulder_forwards[f"/ark:57802/{pfx}"] = api_host
+
     @app.get(
         f"/ark:57802/{{prefixed_path_{pfx}:prefixed_path_{pfx}}}",
         response_class=RedirectResponse,
@@ -362,68 +774,80 @@ async def query_eval():
 
 
 @app.get("/ark:57802/dw0/agu")
-async def agu_index_terms(
+def agu_index_terms(
     accept: Optional[str] = Header(None),
     _mediatype: Optional[
         str
     ] = None,  # https://www.w3.org/TR/dx-prof-conneg/#qsa-key-naming
+    if_none_match: Optional[str] = Header(None),
 ):
-    return response_for(
-        g=load_graph_from_file(
-            "agu_index_terms.ttl",
-            format_="turtle",
-        ),
+    index = agu_index()
+    return cached_response_for(
+        route="agu",
+        version=str(index.mtime),
+        load_graph=lambda: index.graph,
         accept=_mediatype or accept,
+        if_none_match=if_none_match,
+        last_modified=datetime.fromtimestamp(index.mtime, timezone.utc),
     )
 
 
 @app.get("/ark:57802/dw0/agu/{code}")
-async def agu_index_term(
+def agu_index_term(
     code: str,
     accept: Optional[str] = Header(None),
     _mediatype: Optional[
         str
     ] = None,  # https://www.w3.org/TR/dx-prof-conneg/#qsa-key-naming
 ):
-    og = rdflib.Graph()
-    og.parse("agu_index_terms.ttl", format="turtle")
-    results = list(
-        og.query(
-            f"""SELECT ?t ?p ?o WHERE {{ ?t rdfs:comment "CODE: {code}" . ?t ?p ?o . }}"""
-        )
+    g = raise404_if_none(
+        agu_term_graph(code), detail=f"No AGU index term with code {code}"
     )
-    if len(results) == 0:
+    return response_for(g=g, accept=_mediatype or accept)
+
+
+def mirrored_turtle_response(
+    name: str, accept: str, if_none_match: Optional[str] = None
+) -> Response:
+    snapshot = remote_mirror.snapshot(name)
+    if snapshot is None:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No AGU index term with code {code}",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Source document {name} has not been mirrored yet.",
         )
-    g = rdflib.Graph()
-    for s, p, o in results:
-        g.add((s, p, o))
-    return response_for(g=g, accept=_mediatype or accept)
+    return cached_response_for(
+        route=name,
+        version=snapshot.version,
+        load_graph=lambda: Graph().parse(data=snapshot.read(), format="turtle"),
+        accept=accept,
+        if_none_match=if_none_match,
+        last_modified=snapshot.last_modified,
+    )
 
 
 @app.get("/2021/04/marda-dd/test", summary="MaRDA DD Test", tags=["legacy"])
-async def marda_dd_test(accept: Optional[str] = Header(None)):
-    return response_for(
-        g=load_graph_from_file(
-            "https://raw.githubusercontent.com/polyneme/ns/main/hello_world.ttl",
-            format_="turtle",
-        ),
+def marda_dd_test(
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    return mirrored_turtle_response(
+        "marda-dd-test",
         accept=accept,
+        if_none_match=if_none_match,
     )
 
 
 @app.get("/ark:57802/2021/08/mardaphonons", summary="MaRDA Phonons", tags=["legacy"])
-async def marda_phonons(accept: Optional[str] = Header(None)):
+def marda_phonons(
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
     # XXX important that this route is registered *before*
     #     the more general "/ark:{naan}/{rest_of_path:path}" route.
-    return response_for(
-        g=load_graph_from_file(
-            "https://raw.githubusercontent.com/marda-dd/phonons/main/concept_scheme.ttl",
-            format_="turtle",
-        ),
+    return mirrored_turtle_response(
+        "marda-phonons",
         accept=accept,
+        if_none_match=if_none_match,
     )
 
 
@@ -432,7 +856,7 @@ async def marda_phonons(accept: Optional[str] = Header(None)):
     status_code=status.HTTP_201_CREATED,
     tags=["terms"],
 )
-async def import_term(
+def import_term(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -448,7 +872,7 @@ async def import_term(
     check_too_late(year, month)
     check_can_update_term(agent, org, repo)
 
-    term_tgt_uri = f"ark:{naan}/{year}/{month:02d}/{org}/{repo}/{term}"
+    term_tgt_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}/{term}"
     term_src_uri = term_import.term_uri
 
     term_src_namespace, _, source_name = term_src_uri.rpartition("/")
@@ -471,19 +895,115 @@ async def import_term(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"No entry for {term_src_doc} found.",
         )
-    mdb.terms.insert_one(
-        ensure_context(assoc(dissoc(term_src_doc, "_id", "@id"), "@id", term_tgt_uri))
-    )
+    try:
+        mdb.terms.insert_one(
+            ensure_context(
+                merge(
+                    without_storage_fields(dissoc(term_src_doc, "@id")),
+                    {"@id": term_tgt_uri},
+                    first_revision(),
+                )
+            )
+        )
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Term already exists!"
+        )
+    doc_cache.invalidate(mdb, term_tgt_uri)
+    bump_namespace_version(mdb, term_tgt_uri.rpartition("/")[0])
     term_doc = mdb.terms.find_one({"@id": term_tgt_uri})
     return jsonld_doc_response(term_doc, accept)
 
 
+SKOLEM_BULK_MAX_DOCS = int(os.getenv("SKOLEM_BULK_MAX_DOCS") or 10_000)
+
+
+def insert_skolems(
+    mdb: MongoDatabase, naan: ArkNaan, shoulder: ArkShoulder, docs: List[dict]
+) -> List[str]:
+    """Mint an ARK for each of `docs` and write them all with one `bulk_write`.
+
+    Returns the minted ARKs, in the order of `docs`. Docs whose ARK collides with
+    an existing one are re-minted and retried.
+    """
+    n_chars = blade_length(next_ark_count(mdb, naan, shoulder, n=len(docs)))
+    revision = first_revision()
+    arks = [None] * len(docs)
+    pending = list(range(len(docs)))
+    while pending:
+        bons = generate_ark_bons(naan, shoulder, len(pending), n_chars)
+        for i, bon in zip(pending, bons):
+            arks[i] = bon
+        try:
+            mdb.arks.bulk_write(
+                [
+                    InsertOne(
+                        ensure_context(
+                            merge(
+                                docs[i],
+                                {"_id": arks[i], "@id": f"{API_HOST}/{arks[i]}"},
+                                revision,
+                            )
+                        )
+                    )
+                    for i in pending
+                ],
+                ordered=False,
+            )
+            pending = []
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(err["code"] != 11000 for err in errors):
+                raise
+            pending = [pending[err["index"]] for err in errors]
+    return arks
+
+
+@app.post(
+    "/ark:{naan}/{shoulder}:bulk",
+    status_code=status.HTTP_201_CREATED,
+    tags=["skolems"],
+)
+async def create_skolems(
+    naan: ArkNaan,
+    shoulder: ArkShoulder,
+    request: Request,
+    mdb: MongoDatabase = Depends(mongo_db),
+    agent: Agent = Depends(get_current_agent),
+):
+    """Create many skolems from a JSON array (or NDJSON) of docs.
+
+    Returns the minted ids in input order, and a mapping from each input doc's
+    own `@id` (if it has one, e.g. a blank node label) to its minted id.
+    """
+    docs = await read_json_docs(request, max_docs=SKOLEM_BULK_MAX_DOCS)
+
+    def create():
+        check_naan(mdb, naan)
+        check_can_update_skolem(agent, shoulder)
+        check_shoulder_registered(mdb, naan, shoulder)
+        skolem_docs = [without_storage_fields(Doc(**d).dict()) for d in docs]
+        arks = insert_skolems(mdb, naan, shoulder, skolem_docs)
+        redirect_index.put_many(
+            (ark, d["_t"]) for ark, d in zip(arks, skolem_docs) if d.get("_t")
+        )
+        return arks
+
+    arks = await run_in_threadpool(create)
+    ids = [f"{API_HOST}/{ark}" for ark in arks]
+    return {
+        "n_created": len(ids),
+        "ids": ids,
+        "mapping": {d["@id"]: id_ for d, id_ in zip(docs, ids) if "@id" in d},
+    }
+
+
 @app.post(
     "/ark:{naan}/{shoulder}",
     status_code=status.HTTP_201_CREATED,
     tags=["skolems"],
 )
-async def create_skolem(
+def create_skolem(
     naan: ArkNaan,
     shoulder: ArkShoulder,
     skolem_in: Doc,
@@ -494,45 +1014,64 @@ async def create_skolem(
     check_naan(mdb, naan)
     check_can_update_skolem(agent, shoulder)
     check_shoulder_registered(mdb, naan, shoulder)
+    check_no_storage_fields(skolem_in.dict())
 
-    ark_new = create_ark_bon(mdb=mdb, naan=naan, shoulder=shoulder)
-    ark_doc = assoc(skolem_in.dict(), "@id", f"{API_HOST}/{ark_new}")
-    mdb.arks.replace_one({"_id": ark_new}, ensure_context(ark_doc), upsert=False)
-    ark_doc = mdb.arks.find_one({"_id": ark_new})
-    ark_map.cache_clear()
-    return jsonld_doc_response(ark_doc, accept)
+    ark_doc = ensure_context(merge(skolem_in.dict(), first_revision()))
+    stored = claim_ark(mdb, naan, shoulder, ark_doc, id_prefix=f"{API_HOST}/")
+    if stored is None:
+        ark_new = create_ark_bon(mdb=mdb, naan=naan, shoulder=shoulder)
+        stored = merge(ark_doc, {"_id": ark_new, "@id": f"{API_HOST}/{ark_new}"})
+        mdb.arks.replace_one({"_id": ark_new}, stored, upsert=False)
+    if stored.get("_t"):
+        redirect_index.put(stored["_id"], stored["_t"])
+    return jsonld_doc_response(stored, accept)
 
 
 @app.get(
     "/ark:{naan}/{assigned_base_name}",
     tags=["skolems"],
 )
-async def get_skolem(
+def get_skolem(
     naan: ArkNaan,
     assigned_base_name: str,
     mdb: MongoDatabase = Depends(mongo_db),
     _mediatype: Optional[str] = None,
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
 ):
     check_naan(mdb, naan)
 
-    ark_map_url = ark_map(mdb, naan=naan).get(f"ark:{naan}/{assigned_base_name}")
-    # TODO support ?info inflection for {who,what,when,how}
-    #   See: https://n2t.net/e/n2t_apidoc.html#identifier-metadata
-    if ark_map_url:
-        return RedirectResponse(url=ark_map_url, status_code=303)
-
-    indiv_uri = f"{API_HOST}/ark:{naan}/{assigned_base_name}"
-    indiv_doc = raise404_if_none(mdb.arks.find_one({"@id": indiv_uri}))
-
-    return jsonld_doc_response(indiv_doc, _mediatype or accept)
+    ark = f"ark:{naan}/{assigned_base_name}"
+    indiv_doc = doc_cache.get(ark)
+    if indiv_doc is None:
+        generation = doc_cache.generation
+        ark_map_url, indiv_doc = redirect_index.lookup(mdb, ark)
+        # TODO support ?info inflection for {who,what,when,how}
+        #   See: https://n2t.net/e/n2t_apidoc.html#identifier-metadata
+        if ark_map_url:
+            return RedirectResponse(url=ark_map_url, status_code=303)
+
+        # Pooled ARKs not yet claimed by a skolem have no "@id".
+        if indiv_doc is not None and "@id" not in indiv_doc:
+            indiv_doc = None
+        raise404_if_none(indiv_doc)
+        doc_cache.put(ark, indiv_doc, generation)
+
+    accept = _mediatype or accept
+    return conditional_response(
+        doc_validators(indiv_doc, accept),
+        if_none_match,
+        if_modified_since,
+        lambda: cached_doc_response(ark, indiv_doc, accept),
+    )
 
 
 @app.patch(
     "/ark:{naan}/{assigned_base_name}",
     tags=["skolems"],
 )
-async def update_skolem(
+def update_skolem(
     naan: ArkNaan,
     assigned_base_name: str,
     indiv_update: DocUpdate,
@@ -542,21 +1081,180 @@ async def update_skolem(
 ):
     check_naan(mdb, naan)
     check_can_update_skolem(agent, get_shoulder(assigned_base_name))
+    check_no_storage_fields(updated_fields(indiv_update.update))
     indiv_uri = f"{API_HOST}/ark:{naan}/{assigned_base_name}"
-    raise404_if_none(mdb.arks.find_one({"@id": indiv_uri}))
+    indiv_doc = raise404_if_none(
+        update_doc_clearing_equivalences(
+            mdb.arks,
+            {"@id": indiv_uri},
+            with_version_bump(indiv_update.update),
+        )
+    )
+    # Also drops any redirect for it, in every worker (see `doc_cache.on_discard`).
+    doc_cache.invalidate(mdb, f"ark:{naan}/{assigned_base_name}")
+    return jsonld_doc_response(indiv_doc, accept)
 
-    mdb.arks.update_one({"@id": indiv_uri}, unset_equivalences())
 
-    try:
-        mdb.arks.update_one({"@id": indiv_uri}, indiv_update.update)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"mongo update api: {e}",
+TERM_BULK_MAX_DOCS = int(os.getenv("TERM_BULK_MAX_DOCS") or 50_000)
+
+RDF_IMPORT_FORMATS = {
+    "text/turtle": "turtle",
+    "application/ld+json": "json-ld",
+    "application/n-triples": "nt",
+}
+
+term_name_pattern = re.compile(r"^\w+$")
+
+
+def term_docs_from_graph(g: rdflib.Graph):
+    """Split `g` into one JSON-LD doc per subject.
+
+    Returns (docs, errors). Subjects with blank-node values can't be stored as a
+    single doc, so they are reported as errors instead.
+    """
+    errors = []
+    for s in set(g.subjects()):
+        if isinstance(s, rdflib.BNode):
+            continue
+        if any(isinstance(o, rdflib.BNode) for o in g.objects(subject=s)):
+            errors.append(
+                {"@id": str(s), "detail": "Blank-node values are not supported."}
+            )
+            g.remove((s, None, None))
+    out = json.loads(
+        g.serialize(format="json-ld", context=DEFAULT_JSONLD_CONTEXT, auto_compact=True)
+    )
+    nodes = out.get("@graph", [dissoc(out, "@context")] if "@id" in out else [])
+    return [n for n in nodes if not n["@id"].startswith("_:")], errors
+
+
+def validate_term_docs(docs: List[dict], term_namespace_uri: str):
+    """Term docs with full `@id`s in the namespace, and errors for docs without.
+
+    A doc's `@id` may be a bare term name. The namespace's own doc (e.g. the first
+    line of a JSON Lines export) is skipped.
+    """
+    valid, errors = [], []
+    revision = first_revision()
+    for i, doc in enumerate(docs):
+        term_uri = doc.get("@id", "")
+        if not isinstance(term_uri, str):
+            term_uri = ""  # e.g. a number: reported below, as other invalid ids are
+        if term_name_pattern.match(term_uri):
+            term_uri = f"{term_namespace_uri}/{term_uri}"
+        if term_uri == term_namespace_uri:
+            continue
+        ns_uri, _, term = term_uri.rpartition("/")
+        if ns_uri != term_namespace_uri or not term_name_pattern.match(term):
+            errors.append(
+                {
+                    "index": i,
+                    "@id": doc.get("@id"),
+                    "detail": f"@id must be a term in {term_namespace_uri}.",
+                }
+            )
+            continue
+        valid.append(
+            ensure_context(
+                merge(without_storage_fields(doc), {"@id": term_uri}, revision)
+            )
         )
+    return valid, errors
 
-    indiv_doc = mdb.arks.find_one({"@id": indiv_uri})
-    return jsonld_doc_response(indiv_doc, accept)
+
+def insert_term_docs(mdb: MongoDatabase, term_docs: List[dict]):
+    """Insert `term_docs` with one unordered `bulk_write`.
+
+    Returns (created, conflicts), lists of term `@id`s. Terms that already exist,
+    or that repeat within `term_docs`, are conflicts and are not written.
+    """
+    existing = {
+        d["@id"]
+        for d in mdb.terms.find(
+            {"@id": {"$in": [d["@id"] for d in term_docs]}}, ["@id"]
+        )
+    }
+    new_docs, conflicts = [], []
+    for d in term_docs:
+        if d["@id"] in existing:
+            conflicts.append(d["@id"])
+        else:
+            existing.add(d["@id"])
+            new_docs.append(d)
+    if new_docs:
+        try:
+            mdb.terms.bulk_write([InsertOne(d) for d in new_docs], ordered=False)
+        except BulkWriteError as e:
+            errors = e.details["writeErrors"]
+            if any(err["code"] != 11000 for err in errors):
+                raise
+            # Created concurrently, since the check above.
+            raced = {new_docs[err["index"]]["@id"] for err in errors}
+            conflicts.extend(raced)
+            new_docs = [d for d in new_docs if d["@id"] not in raced]
+    created = [d["@id"] for d in new_docs]
+    return created, conflicts
+
+
+@app.post(
+    "/ark:{naan}/{year}/{month}/{org}/{repo}:bulk",
+    status_code=status.HTTP_201_CREATED,
+    tags=["terms"],
+)
+async def create_terms(
+    naan: ArkNaan,
+    year: int,
+    month: int,
+    org: str,
+    repo: str,
+    request: Request,
+    mdb: MongoDatabase = Depends(mongo_db),
+    agent: Agent = Depends(get_current_agent),
+):
+    """Create many terms from an RDF document or from JSON term docs.
+
+    The body is parsed according to its Content-Type: Turtle, JSON-LD or
+    N-Triples are split into a doc per subject; `application/x-ndjson` or a JSON
+    array are taken as term docs. Existing terms are reported as conflicts, not
+    overwritten.
+    """
+    term_namespace_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}"
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    rdf_format = RDF_IMPORT_FORMATS.get(content_type)
+    if rdf_format is None:
+        docs = await read_json_docs(request, max_docs=TERM_BULK_MAX_DOCS)
+    else:
+        data = await request.body()
+
+    def create():
+        check_naan(mdb, naan)
+        check_too_late(year, month)
+        check_can_update_term(agent, org, repo)
+        raise404_if_none(mdb.namespaces.find_one({"@id": term_namespace_uri}))
+        errors = []
+        if rdf_format is None:
+            term_docs = docs
+        else:
+            try:
+                g = Graph().parse(data=data, format=rdf_format)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Could not parse {content_type}: {e}",
+                )
+            term_docs, errors = term_docs_from_graph(g)
+        term_docs, invalid = validate_term_docs(term_docs, term_namespace_uri)
+        created, conflicts = insert_term_docs(mdb, term_docs)
+        if created:
+            bump_namespace_version(mdb, term_namespace_uri)
+        return {
+            "n_created": len(created),
+            "created": created,
+            "conflicts": conflicts,
+            "errors": errors + invalid,
+        }
+
+    return await run_in_threadpool(create)
 
 
 @app.post(
@@ -564,7 +1262,7 @@ async def update_skolem(
     status_code=status.HTTP_201_CREATED,
     tags=["terms"],
 )
-async def create_term(
+def create_term(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -579,15 +1277,19 @@ async def create_term(
     check_naan(mdb, naan)
     check_too_late(year, month)
     check_can_update_term(agent, org, repo)
+    check_no_storage_fields(term_in.dict())
 
     term_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}/{term}"
-    if mdb.terms.find_one({"@id": term_uri}):
+    term_doc = ensure_context(
+        merge(term_in.dict(), {"@id": term_uri}, first_revision())
+    )
+    try:
+        mdb.terms.insert_one(term_doc)
+    except DuplicateKeyError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Term already exists!"
         )
-    term_doc = assoc(term_in.dict(), "@id", term_uri)
-    mdb.terms.insert_one(ensure_context(term_doc))
-    term_doc = mdb.terms.find_one({"@id": term_uri})
+    bump_namespace_version(mdb, term_uri.rpartition("/")[0])
     return jsonld_doc_response(term_doc, accept)
 
 
@@ -595,7 +1297,7 @@ async def create_term(
     "/ark:{naan}/{year}/{month}/{org}/{repo}/{term}",
     tags=["terms"],
 )
-async def get_term(
+def get_term(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -607,20 +1309,40 @@ async def get_term(
     ] = None,  # https://www.w3.org/TR/dx-prof-conneg/#qsa-key-naming
     mdb: MongoDatabase = Depends(mongo_db),
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
 ):
     check_naan(mdb, naan)
 
     term_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}/{term}"
-    term_doc = raise404_if_none(mdb.terms.find_one({"@id": term_uri}))
+    accept = _mediatype or accept
+    if is_closed_month(year, month) and (
+        manifest := snapshot_store.manifest(term_uri.rpartition("/")[0])
+    ):
+        entry = raise404_if_none(manifest["terms"].get(term))
+        rv = snapshot_response(
+            entry, year, month, accept, if_none_match, if_modified_since
+        )
+        if rv is not None:
+            return rv
 
-    return jsonld_doc_response(term_doc, _mediatype or accept)
+    term_doc = raise404_if_none(
+        doc_cache.get_or_load(term_uri, lambda: mdb.terms.find_one({"@id": term_uri}))
+    )
+    headers = merge(doc_validators(term_doc, accept), month_cache_control(year, month))
+    return conditional_response(
+        headers,
+        if_none_match,
+        if_modified_since,
+        lambda: cached_doc_response(term_uri, term_doc, accept),
+    )
 
 
 @app.patch(
     "/ark:{naan}/{year}/{month}/{org}/{repo}/{term}",
     tags=["terms"],
 )
-async def update_term(
+def update_term(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -635,20 +1357,17 @@ async def update_term(
     check_naan(mdb, naan)
     check_too_late(year, month)
     check_can_update_term(agent, org, repo)
+    check_no_storage_fields(updated_fields(term_update.update))
     term_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}/{term}"
-    raise404_if_none(mdb.terms.find_one({"@id": term_uri}))
-
-    mdb.terms.update_one({"@id": term_uri}, unset_equivalences())
-
-    try:
-        mdb.terms.update_one({"@id": term_uri}, term_update.update)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"mongo update api: {e}",
+    term_doc = raise404_if_none(
+        update_doc_clearing_equivalences(
+            mdb.terms,
+            {"@id": term_uri},
+            with_version_bump(term_update.update),
         )
-
-    term_doc = mdb.terms.find_one({"@id": term_uri})
+    )
+    doc_cache.invalidate(mdb, term_uri)
+    bump_namespace_version(mdb, term_uri.rpartition("/")[0])
     return jsonld_doc_response(term_doc, accept)
 
 
@@ -656,7 +1375,7 @@ async def update_term(
     "/ark:{naan}/{year}/{month}/{org}/{repo}/{term}",
     tags=["terms"],
 )
-async def delete_term(
+def delete_term(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -673,6 +1392,8 @@ async def delete_term(
     raise404_if_none(mdb.terms.find_one({"@id": term_uri}))
 
     rv: DeleteResult = mdb.terms.delete_one({"@id": term_uri})
+    doc_cache.invalidate(mdb, term_uri)
+    bump_namespace_version(mdb, term_uri.rpartition("/")[0])
     return {"n_deleted": rv.deleted_count}
 
 
@@ -681,7 +1402,7 @@ async def delete_term(
     status_code=status.HTTP_201_CREATED,
     tags=["namespaces"],
 )
-async def create_namespace(
+def create_namespace(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -695,20 +1416,21 @@ async def create_namespace(
     check_naan(mdb, naan)
     check_too_late(year, month)
     check_can_update_term(agent, org, repo)
+    check_no_storage_fields(ns_in.dict())
 
     term_namespace_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}"
-    if mdb.namespaces.find_one({"@id": term_namespace_uri}):
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, detail="Namespace already exists!"
-        )
-
     ns_doc = merge(
         {"dct:title": repo},
         ns_in.dict(),
         {"@id": term_namespace_uri, "@type": "owl:Ontology"},
+        first_revision(),
     )
-    mdb.namespaces.insert_one(ensure_context(ns_doc))
-    ns_doc = mdb.namespaces.find_one({"@id": term_namespace_uri})
+    try:
+        mdb.namespaces.insert_one(ensure_context(ns_doc))
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Namespace already exists!"
+        )
     return jsonld_doc_response(dissoc(ns_doc, "_id"), accept)
 
 
@@ -716,7 +1438,7 @@ async def create_namespace(
     "/ark:{naan}/{year}/{month}/{org}/{repo}",
     tags=["namespaces"],
 )
-async def get_namespace(
+def get_namespace(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -725,25 +1447,57 @@ async def get_namespace(
     _mediatype: Optional[str] = None,
     mdb: MongoDatabase = Depends(mongo_db),
     accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
 ):
+    """Namespace with its terms.
+
+    Every write to the namespace or its terms bumps the namespace's revision, so
+    validators come from the namespace doc alone. Namespaces in closed months are
+    served from their published snapshot (see `publish_closed_month_snapshots`).
+    """
     check_naan(mdb, naan)
 
     term_namespace_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}"
+    accept = _mediatype or accept
+    if is_closed_month(year, month) and (
+        manifest := snapshot_store.manifest(term_namespace_uri)
+    ):
+        rv = snapshot_response(
+            manifest, year, month, accept, if_none_match, if_modified_since
+        )
+        if rv is not None:
+            return rv
+
     ns_doc = raise404_if_none(mdb.namespaces.find_one({"@id": term_namespace_uri}))
-    term_docs = list(mdb.terms.find({"@id": {"$regex": rf"^{term_namespace_uri}"}}))
+    term_docs_filter = id_prefix_filter(f"{term_namespace_uri}/")
+    headers = merge(doc_validators(ns_doc, accept), month_cache_control(year, month))
+
+    def make_response():
+        preferred = next(iter(acceptable(accept, extra=(NDJSON, N_QUADS))), None)
+        if preferred is not None and streamable(preferred):
+            term_docs = mdb.terms.find(term_docs_filter).batch_size(
+                NAMESPACE_STREAM_BATCH_SIZE
+            )
+            return StreamingResponse(
+                stream_namespace(ns_doc, term_docs, preferred),
+                media_type=preferred.media_type,
+            )
+        if preferred == HTML:
+            return namespace_html_response(mdb, ns_doc, term_docs_filter, accept)
+        term_docs = list(mdb.terms.find(term_docs_filter))
+        return jsonld_docs_response([ns_doc] + term_docs, accept)
 
-    g = Graph()
-    g.parse(data=json.dumps(dissoc(ns_doc, "_id")), format="json-ld")
-    for doc in term_docs:
-        g.parse(data=json.dumps(dissoc(doc, "_id")), format="json-ld")
-    return response_for(g, _mediatype or accept)
+    return conditional_response(
+        headers, if_none_match, if_modified_since, make_response
+    )
 
 
 @app.patch(
     "/ark:{naan}/{year}/{month}/{org}/{repo}",
     tags=["namespaces"],
 )
-async def update_namespace(
+def update_namespace(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -757,18 +1511,15 @@ async def update_namespace(
     check_naan(mdb, naan)
     check_too_late(year, month)
     check_can_update_term(agent, org, repo)
+    check_no_storage_fields(updated_fields(update.update))
     term_namespace_uri = f"{API_HOST}/ark:{naan}/{year}/{month:02d}/{org}/{repo}"
-    raise404_if_none(mdb.namespaces.find_one({"@id": term_namespace_uri}))
-
-    try:
-        mdb.namespaces.update_one({"@id": term_namespace_uri}, update.update)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"mongo update api: {e}",
+    ns_doc = raise404_if_none(
+        update_doc_or_422(
+            mdb.namespaces,
+            {"@id": term_namespace_uri},
+            with_version_bump(update.update),
         )
-
-    ns_doc = mdb.namespaces.find_one({"@id": term_namespace_uri})
+    )
     return jsonld_doc_response(ns_doc, accept)
 
 
@@ -776,7 +1527,7 @@ async def update_namespace(
     "/ark:{naan}/{year}/{month}/{org}/{repo}",
     tags=["namespaces"],
 )
-async def delete_namespace(
+def delete_namespace(
     naan: ArkNaan,
     year: int,
     month: int,
@@ -792,20 +1543,79 @@ async def delete_namespace(
     raise404_if_none(mdb.namespaces.find_one({"@id": term_namespace_uri}))
 
     rv: DeleteResult = mdb.namespaces.delete_one({"@id": term_namespace_uri})
+    namespace_html_cache.pop(term_namespace_uri)
     return {"n_deleted": rv.deleted_count}
 
 
 term_namespace_pattern = re.compile(
-    rf"{API_HOST}/ark:(?P<naan>\d{5,})/(?P<year>\d{4})/(?P<month>\d{2})/(?P<org>[\w\-]+)/(?P<repo>[\w\-]+)"
+    rf"{API_HOST}/ark:(?P<naan>\d{{5,}})/(?P<year>\d{{4}})/(?P<month>\d{{2}})/(?P<org>[\w\-]+)/(?P<repo>[\w\-]+)"
 )
 
 
+def render_snapshot(docs: List[dict], media_type: str) -> Optional[bytes]:
+    rv = jsonld_docs_response(docs, media_type)
+    return rv.body if rv.media_type == media_type else None
+
+
+def publish_closed_month_snapshots(mdb: MongoDatabase) -> int:
+    """Publish namespaces of closed months not yet published at their revision.
+
+    Skipped (returning 0) while another worker is publishing. Stops early if
+    this worker loses the lease, e.g. by being too slow to renew it.
+    """
+    owner = acquire_lease(mdb, "snapshots", SNAPSHOT_PUBLISH_LEASE_SECONDS)
+    if owner is None:
+        return 0
+    try:
+        n_published = 0
+        for ns in mdb.namespaces.find({}, ["@id", "_v", "_modified"]):
+            m = term_namespace_pattern.fullmatch(ns["@id"])
+            if m is None or not is_closed_month(int(m["year"]), int(m["month"])):
+                continue
+            manifest = snapshot_store.manifest(ns["@id"])
+            if manifest is not None and doc_revision(
+                entry_doc(manifest)
+            ) == doc_revision(ns):
+                continue
+            ns_doc = mdb.namespaces.find_one({"@id": ns["@id"]})
+            term_docs = mdb.terms.find(id_prefix_filter(f"{ns['@id']}/"))
+            snapshot_store.publish(ns_doc, term_docs, render_snapshot)
+            n_published += 1
+            if not renew_lease(mdb, "snapshots", owner, SNAPSHOT_PUBLISH_LEASE_SECONDS):
+                break
+        return n_published
+    finally:
+        release_lease(mdb, "snapshots", owner)
+
+
+@app.post(
+    "/ark:{naan}/9999/12/system/agents/token",
+    tags=["agents"],
+)
+def create_agent_token(
+    naan: ArkNaan,
+    mdb: MongoDatabase = Depends(mongo_db),
+    credentials: HTTPBasicCredentials = Depends(security),
+):
+    """Exchange an agent's credentials for a bearer token.
+
+    Requests authorized with the token skip the agent lookup and password check.
+    """
+    check_naan(mdb, naan)
+    agent = authenticate_agent(naan, credentials)
+    return {
+        "access_token": create_access_token(naan, agent),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
 @app.post(
     "/ark:{naan}/9999/12/system/agents",
     status_code=status.HTTP_201_CREATED,
     tags=["agents"],
 )
-async def create_agent(
+def create_agent(
     naan: ArkNaan,
     agent_in: AgentIn,
     mdb: MongoDatabase = Depends(mongo_db),
@@ -836,7 +1646,7 @@ async def create_agent(
     "/ark:{naan}/9999/12/system/agents/{username}",
     tags=["agents"],
 )
-async def get_agent(
+def get_agent(
     naan: ArkNaan,
     username: str,
     mdb: MongoDatabase = Depends(mongo_db),
@@ -856,7 +1666,7 @@ async def get_agent(
     "/ark:{naan}/9999/12/system/agents/{username}",
     tags=["agents"],
 )
-async def update_agent(
+def update_agent(
     naan: ArkNaan,
     username: str,
     update: DocUpdate,
@@ -879,7 +1689,7 @@ async def update_agent(
     "/ark:{naan}/9999/12/system/agents/{username}",
     tags=["agents"],
 )
-async def delete_agent(
+def delete_agent(
     naan: ArkNaan,
     username: str,
     mdb: MongoDatabase = Depends(mongo_db),
@@ -899,11 +1709,9 @@ async def delete_agent(
 def ensure_initial_resources_on_boot():
     """ensure these resources are loaded when (re-)booting the system."""
     mdb = mongo_db()
+    ensure_indexes(mdb)
 
-    with open(REPO_ROOT_DIR.joinpath("ark_map.csv")) as csvfile:
-        reader = csv.DictReader(csvfile)
-        docs = [{"_id": row["ark"], "_t": row["url"]} for row in reader]
-    mdb.arks.bulk_write([ReplaceOne(pick(["_id"], d), d, upsert=True) for d in docs])
+    load_ark_map(mdb, REPO_ROOT_DIR.joinpath("ark_map.csv"), index=redirect_index)
 
     with open(REPO_ROOT_DIR.joinpath("ark_naan_shoulder_map.csv")) as csvfile:
         reader = csv.DictReader(csvfile)
@@ -920,6 +1728,76 @@ def ensure_initial_resources_on_boot():
             {"$addToSet": {"shoulders": {"$each": d["shoulders"]}}},
             upsert=True,
         )
+    naan_registry.load(mdb)
+
+
+@app.on_event("startup")
+def follow_naan_registry_on_boot():
+    """keep the in-process copy of registered NAANs and shoulders up to date."""
+    naan_registry.keep_fresh(mongo_db())
+
+
+# Skolem writes that change or unset a redirect (`_t`) reach every worker's index.
+doc_cache.on_discard(redirect_index.discard)
+
+
+@app.on_event("startup")
+def follow_doc_cache_invalidations_on_boot():
+    """drop cached docs that other workers write to."""
+    mdb = mongo_db()
+    ensure_invalidations_index(mdb)
+    doc_cache.follow_invalidations(mdb)
+
+
+@app.on_event("startup")
+def warn_if_no_tokens_on_boot():
+    """say so if there is no key to sign bearer tokens with."""
+    warn_if_no_tokens()
+
+
+@app.on_event("startup")
+async def size_threadpool_on_boot():
+    """size the worker thread pool that runs blocking route handlers."""
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
+
+@app.on_event("startup")
+def load_static_vocabs_on_boot():
+    """parse static vocabularies up front rather than on first request."""
+    agu_index()
+
+
+@app.on_event("startup")
+async def mirror_remote_sources_on_boot():
+    """fetch any remote source documents not yet mirrored, then keep them fresh."""
+    await run_in_threadpool(remote_mirror.refresh_all, missing_only=True)
+    asyncio.create_task(remote_mirror.keep_refreshed())
+
+
+@app.on_event("startup")
+async def fill_ark_pools_on_boot():
+    """keep pools of pre-minted ARKs filled for every registered shoulder."""
+    asyncio.create_task(keep_pools_filled(mongo_db()))
+
+
+@app.on_event("startup")
+async def publish_snapshots_on_boot():
+    """publish snapshots of namespaces in closed months, and of those that close."""
+    asyncio.create_task(
+        keep_published(lambda: publish_closed_month_snapshots(mongo_db()))
+    )
+
+
+register_gauge(
+    "ark_pool_depth",
+    "Pre-minted ARKs available to claim, per NAAN and shoulder.",
+    lambda: pool_depths(mongo_db()),
+)
+
+
+@app.get("/metrics", tags=["util"], response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics())
 
 
 @app.get(
@@ -960,7 +1838,7 @@ async def _get_namespace(
     tags=["util"],
     summary="Get ARK (Arbitrary ID Pattern)",
 )
-async def ark(
+def ark(
     naan: int,
     assigned_base_name: str,
     rest_of_path: str,
@@ -0,0 +1,85 @@
+"""Metrics in the Prometheus text exposition format."""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Sample = Tuple[Dict[str, str], float]
+
+_collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def register_gauge(name: str, help_: str, collect: Callable[[], Iterable[Sample]]):
+    """Register a gauge whose (labels, value) samples are collected at scrape time."""
+    _collectors.append((name, help_, "gauge", collect))
+
+
+def register_counter(name: str, help_: str, collect: Callable[[], Iterable[Sample]]):
+    """Register a counter whose (labels, total) samples are collected at scrape time."""
+    _collectors.append((name, help_, "counter", collect))
+
+
+class Histogram:
+    """Observations (e.g. latencies, in seconds) counted into cumulative buckets."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        """(name suffix, labels, value) samples, as Prometheus expects them."""
+        with self._lock:
+            series = {key: list(counts) for key, counts in self._series.items()}
+        for key, counts in sorted(series.items()):
+            labels, cumulative = dict(key), 0
+            for le, count in zip([*self.buckets, "+Inf"], counts[:-1]):
+                cumulative += count
+                yield "_bucket", {**labels, "le": str(le)}, cumulative
+            yield "_sum", labels, counts[-1]
+            yield "_count", labels, cumulative
+
+
+_histograms: List[Tuple[str, str, Histogram]] = []
+
+
+def register_histogram(
+    name: str, help_: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    histogram = Histogram(buckets)
+    _histograms.append((name, help_, histogram))
+    return histogram
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{{{inner}}}"
+
+
+def render_metrics() -> str:
+    lines = []
+    for name, help_, type_, collect in _collectors:
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} {type_}")
+        for labels, value in collect():
+            lines.append(f"{name}{_labels(labels)} {value}")
+    for name, help_, histogram in _histograms:
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} histogram")
+        for suffix, labels, value in histogram.samples():
+            lines.append(f"{name}{suffix}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
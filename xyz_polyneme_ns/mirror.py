@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Union
+
+import requests
+from starlette.concurrency import run_in_threadpool
+
+from xyz_polyneme_ns.util import REPO_ROOT_DIR, now
+
+MIRROR_DIR = os.getenv("MIRROR_DIR")
+MIRROR_REFRESH_SECONDS = int(os.getenv("MIRROR_REFRESH_SECONDS") or 3600)
+
+REMOTE_SOURCES = {
+    "marda-dd-test": "https://raw.githubusercontent.com/polyneme/ns/main/hello_world.ttl",
+    "marda-phonons": "https://raw.githubusercontent.com/marda-dd/phonons/main/concept_scheme.ttl",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot(NamedTuple):
+    path: Path
+    version: str
+    last_modified: datetime
+
+    def read(self) -> bytes:
+        return self.path.read_bytes()
+
+
+def _write(path: Path, content: bytes):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+class RemoteMirror:
+    """Local, on-disk copies of remote documents.
+
+    Each fetched version of source `name` is stored as `<directory>/<name>.<sha256>`,
+    and `<name>.json` records the current one's sha256, ETag and Last-Modified.
+    The record is written last, so a reader of it always finds the content it
+    describes. Readers only ever see the local copy; `refresh` updates it with a
+    conditional GET.
+    """
+
+    def __init__(
+        self,
+        directory: Union[Path, str],
+        sources: Dict[str, str],
+        timeout: float = 10,
+    ):
+        self.directory = Path(directory)
+        self.sources = sources
+        self.timeout = timeout
+        # name -> ((inode, mtime) of the meta file, snapshot)
+        self._snapshots: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, sha256: str) -> Path:
+        return self.directory.joinpath(f"{name}.{sha256}")
+
+    def _meta_path(self, name: str) -> Path:
+        return self.directory.joinpath(f"{name}.json")
+
+    def _read_meta(self, name: str) -> Optional[dict]:
+        """The record of `name`'s current version, if that version is on disk."""
+        try:
+            meta = json.loads(self._meta_path(name).read_text())
+        except FileNotFoundError:
+            return None
+        if not self._path(name, meta["sha256"]).exists():
+            return None  # e.g. written by an older layout of the mirror
+        return meta
+
+    def snapshot(self, name: str) -> Optional[Snapshot]:
+        """The current local copy of `name`, or None if it was never fetched.
+
+        Costs a `stat` per call, so a copy refreshed by another worker is seen at
+        once.
+        """
+        try:
+            stat = self._meta_path(name).stat()
+        except FileNotFoundError:
+            return None
+        # Each write replaces the file, so the inode tells versions apart even
+        # within the resolution of mtime.
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._snapshots.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        meta = self._read_meta(name)
+        if meta is None:
+            return None
+        snapshot = Snapshot(
+            path=self._path(name, meta["sha256"]),
+            version=meta["sha256"],
+            last_modified=datetime.fromisoformat(meta["last_modified"]),
+        )
+        with self._lock:
+            self._snapshots[name] = (stamp, snapshot)
+        return snapshot
+
+    def _prune(self, name: str, keep: set):
+        """Remove versions of `name` other than `keep`."""
+        for path in self.directory.glob(f"{name}.*"):
+            if path.name.partition(".")[2] not in keep | {"json"}:
+                path.unlink(missing_ok=True)
+
+    def refresh(self, name: str) -> bool:
+        """Conditionally re-fetch `name`. Returns True if the local copy changed."""
+        meta = self._read_meta(name) or {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("http_last_modified"):
+            headers["If-Modified-Since"] = meta["http_last_modified"]
+
+        rv = requests.get(self.sources[name], headers=headers, timeout=self.timeout)
+        if rv.status_code == 304:
+            return False
+        rv.raise_for_status()
+
+        sha256 = hashlib.sha256(rv.content).hexdigest()
+        if sha256 == meta.get("sha256"):
+            return False
+        http_last_modified = rv.headers.get("Last-Modified")
+        new_meta = {
+            "url": self.sources[name],
+            "sha256": sha256,
+            "etag": rv.headers.get("ETag"),
+            "http_last_modified": http_last_modified,
+            "last_modified": (
+                parsedate_to_datetime(http_last_modified)
+                if http_last_modified
+                else now()
+            ).isoformat(),
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write(self._path(name, sha256), rv.content)
+        _write(self._meta_path(name), json.dumps(new_meta).encode())
+        # The version just replaced stays, for readers that are still on it.
+        self._prune(name, keep={sha256, meta.get("sha256")})
+        return True
+
+    def refresh_all(self, missing_only=False):
+        for name in self.sources:
+            if missing_only and self.snapshot(name) is not None:
+                continue
+            try:
+                self.refresh(name)
+            except (requests.RequestException, OSError) as e:
+                logger.warning(f"Could not refresh mirror of {name}: {e}")
+
+    async def keep_refreshed(self, interval: float = MIRROR_REFRESH_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.refresh_all)
+            except Exception as e:
+                logger.warning(f"Could not refresh mirrors: {e}")
+
+
+remote_mirror = RemoteMirror(
+    REPO_ROOT_DIR.joinpath(MIRROR_DIR or "mirror"), REMOTE_SOURCES
+)
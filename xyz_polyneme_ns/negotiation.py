@@ -0,0 +1,135 @@
+"""Content negotiation over the `Accept` header (RFC 7231, section 5.3.2)."""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import rdflib
+from rdflib.serializer import Serializer
+
+
+class Serialization(NamedTuple):
+    media_type: str  # Content-Type of the response
+    format: str  # rdflib serializer plugin name, or "html"
+
+
+HTML = Serialization(media_type="text/html", format="html")
+# JSON Lines of stored docs, which only some routes offer.
+NDJSON = Serialization(media_type="application/x-ndjson", format="ndjson")
+# Quads need a context-aware store, which only streamed namespaces are given.
+N_QUADS = Serialization(media_type="application/n-quads", format="nquads")
+
+# Content-Types for rdflib serializers that aren't registered under a media type.
+FORMAT_MEDIA_TYPES = {
+    "pretty-xml": "application/rdf+xml",
+    "longturtle": "text/turtle",
+    "nt11": "application/n-triples",
+    "hext": "application/hex+x-ndjson",
+}
+
+# What to offer, in order, for wildcard media ranges like `*/*` and `text/*`.
+SERVER_PREFERENCE = [
+    "text/turtle",
+    "application/ld+json",
+    "application/rdf+xml",
+    "application/n-triples",
+    "text/n3",
+    "application/trig",
+    "text/html",
+]
+
+
+def _serializes_plain_graphs(plugin) -> bool:
+    try:
+        plugin.getClass()(rdflib.Graph())
+    except Exception:  # e.g. N-Quads and TriX need a context-aware store
+        return False
+    return True
+
+
+def _serializations() -> Dict[str, Serialization]:
+    """Every name a client may ask for, mapped to how to serialize for it.
+
+    Includes rdflib's short format names (e.g. `turtle`, `nt`), which clients of
+    this API have long been able to put in the `Accept` header. Only serializers
+    that work on the plain `Graph`s that routes build are offered.
+    """
+    plugins = [
+        p for p in rdflib.plugin.plugins(kind=Serializer) if _serializes_plain_graphs(p)
+    ]
+    class_media_types = {
+        (p.module_path, p.class_name): p.name for p in plugins if "/" in p.name
+    }
+    table = {HTML.media_type: HTML}
+    for p in plugins:
+        media_type = (
+            p.name
+            if "/" in p.name
+            else FORMAT_MEDIA_TYPES.get(p.name)
+            or class_media_types.get((p.module_path, p.class_name), p.name)
+        )
+        table[p.name] = Serialization(media_type=media_type, format=p.name)
+    return table
+
+
+SERIALIZATIONS = _serializations()
+
+
+def parse_accept(accept: Optional[str]) -> List[Tuple[str, float]]:
+    """(media range, q) pairs from an Accept header, most preferred first.
+
+    Parameters other than `q` are ignored, ranges with q=0 are dropped, and ranges
+    with equal q keep their order in the header. A missing header accepts anything.
+    """
+    if not accept:
+        return [("*/*", 1.0)]
+    ranges = []
+    for element in accept.split(","):
+        media_range, *params = [part.strip() for part in element.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+                break
+        if q > 0:
+            ranges.append((media_range.lower(), q))
+    return sorted(ranges, key=lambda r: r[1], reverse=True)
+
+
+def _expand(media_range: str, table: Dict[str, Serialization]) -> List[Serialization]:
+    if media_range == "*/*" or media_range == "*":
+        return [table[t] for t in SERVER_PREFERENCE]
+    if media_range.endswith("/*"):
+        prefix = media_range[:-1]
+        return [table[t] for t in SERVER_PREFERENCE if t.startswith(prefix)]
+    return [table[media_range]] if media_range in table else []
+
+
+@lru_cache(maxsize=512)
+def acceptable(
+    accept: Optional[str], extra: Tuple[Serialization, ...] = ()
+) -> Tuple[Serialization, ...]:
+    """Serializations we can produce for `accept`, most preferred first.
+
+    Only ever lists serializations rdflib supports, plus HTML (which the caller
+    must check it can render for a given graph) and any `extra` ones the route
+    offers. Wildcard ranges never match `extra` serializations.
+    """
+    table = SERIALIZATIONS
+    if extra:
+        table = {
+            **SERIALIZATIONS,
+            **{s.format: s for s in extra},
+            **{s.media_type: s for s in extra},
+        }
+    rv, seen = [], set()
+    for media_range, _ in parse_accept(accept):
+        for serialization in _expand(media_range, table):
+            if serialization.media_type not in seen:
+                seen.add(serialization.media_type)
+                rv.append(serialization)
+    return tuple(rv)
@@ -0,0 +1,117 @@
+"""ARKs that redirect to a target URL (`_t`), e.g. those loaded from ark_map.csv.
+
+Only redirects are held in memory, and only the `REDIRECT_INDEX_SIZE` most
+recently used, so memory stays bounded however many skolems `arks` holds. Any
+other ARK costs one point lookup by `_id`.
+
+`RedirectMiddleware` answers redirects it can from memory before a request
+reaches routing, dependency injection or Mongo.
+"""
+import math
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo.database import Database as MongoDatabase
+from starlette import status
+from starlette.datastructures import URL
+from starlette.responses import RedirectResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from xyz_polyneme_ns.cache import TTLCache
+
+REDIRECT_INDEX_SIZE = int(os.getenv("REDIRECT_INDEX_SIZE") or 100_000)
+
+
+class RedirectIndex:
+    def __init__(self, maxsize: int = REDIRECT_INDEX_SIZE):
+        self._targets = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    def get(self, ark: str) -> Optional[str]:
+        return self._targets.get(ark)
+
+    def put(self, ark: str, target: str):
+        self._targets.set(ark, target)
+
+    def put_many(self, redirects: Iterable[Tuple[str, str]]):
+        for ark, target in redirects:
+            self._targets.set(ark, target)
+
+    def discard(self, ark: str):
+        self._targets.pop(ark)
+
+    def lookup(
+        self, mdb: MongoDatabase, ark: str
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """(redirect target, stored doc) for `ark`, either of which may be None.
+
+        A redirect is answered from memory if it can be. Otherwise this is one
+        point lookup, whose doc the caller can serve when it isn't a redirect.
+        """
+        target = self.get(ark)
+        if target is not None:
+            return target, None
+        doc = mdb.arks.find_one({"_id": ark})
+        if doc is not None and doc.get("_t"):
+            self.put(ark, doc["_t"])
+            return doc["_t"], None
+        return None, doc
+
+
+redirect_index = RedirectIndex()
+
+
+# Path prefixes (e.g. "/ark:57802/p0") whose ARKs another NMA resolves, mapped to
+# the API host to forward them to. See `main.fwd_57802_pfx`.
+shoulder_forwards: Dict[str, str] = {}
+
+
+class RedirectMiddleware:
+    """Redirect known ARKs without routing, for `GET`/`HEAD` of `/ark:...` paths.
+
+    Handles ARKs in `index`, and ARKs under `forwards` prefixes, with or without a
+    slash before the NAAN (`/ark:/57802/...`), in one redirect. Anything else is
+    passed on to `app` unchanged.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        api_host: str,
+        index: RedirectIndex = redirect_index,
+        forwards: Dict[str, str] = shoulder_forwards,
+    ):
+        self.app = app
+        self.api_host = api_host
+        self.index = index
+        self.forwards = forwards
+
+    def redirect_for(self, scope: Scope) -> Optional[RedirectResponse]:
+        path = scope["path"]
+        if not path.startswith("/ark:"):
+            return None
+        slash_before_naan = path.startswith("/ark:/")
+        if slash_before_naan:
+            path = path.replace("/ark:/", "/ark:", 1)
+        for prefix, api_host in self.forwards.items():
+            if path.startswith(prefix) and len(path) > len(prefix):
+                url = str(URL(scope=scope))
+                if slash_before_naan:
+                    url = url.replace("ark:/", "ark:")
+                return RedirectResponse(
+                    url=url.replace(self.api_host, api_host),
+                    status_code=status.HTTP_302_FOUND,
+                )
+        ark = path[1:]
+        if ark.count("/") == 1:
+            target = self.index.get(ark)
+            if target is not None:
+                return RedirectResponse(url=target, status_code=303)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            response = self.redirect_for(scope)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
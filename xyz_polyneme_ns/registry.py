@@ -0,0 +1,74 @@
+"""The NAANs this server is a name mapping authority for, and their shoulders.
+
+`naans` only changes at boot (see `ensure_initial_resources_on_boot`) or by hand,
+so route handlers check it against an in-process copy. The copy follows a change
+stream on `naans` where the deployment offers one, and is otherwise reloaded on
+an interval.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+from pymongo.database import Database as MongoDatabase
+from pymongo.errors import PyMongoError
+
+NAAN_REGISTRY_REFRESH_SECONDS = float(os.getenv("NAAN_REGISTRY_REFRESH_SECONDS") or 60)
+
+logger = logging.getLogger(__name__)
+
+
+class NaanRegistry:
+    def __init__(self):
+        self._shoulders: Optional[Dict[int, FrozenSet[str]]] = None
+        self._lock = threading.Lock()
+
+    def load(self, mdb: MongoDatabase):
+        shoulders = {
+            d["_id"]: frozenset(d["shoulders"])
+            for d in mdb.naans.find({}, ["shoulders"])
+        }
+        self._shoulders = shoulders
+
+    def _snapshot(self, mdb: MongoDatabase) -> Dict[int, FrozenSet[str]]:
+        if self._shoulders is None:
+            with self._lock:
+                if self._shoulders is None:
+                    self.load(mdb)
+        return self._shoulders
+
+    def has_naan(self, mdb: MongoDatabase, naan: int) -> bool:
+        return naan in self._snapshot(mdb)
+
+    def shoulders(self, mdb: MongoDatabase, naan: int) -> FrozenSet[str]:
+        return self._snapshot(mdb).get(naan, frozenset())
+
+    def _keep_fresh(self, mdb: MongoDatabase, interval: float):
+        try:
+            with mdb.naans.watch() as stream:
+                self.load(mdb)  # catch changes made before the stream opened
+                for _ in stream:
+                    self.load(mdb)
+        except PyMongoError as e:
+            logger.info(f"Polling naans every {interval}s (no change stream: {e})")
+        while True:
+            time.sleep(interval)
+            try:
+                self.load(mdb)
+            except PyMongoError as e:
+                logger.warning(f"Could not reload naans: {e}")
+
+    def keep_fresh(
+        self, mdb: MongoDatabase, interval: float = NAAN_REGISTRY_REFRESH_SECONDS
+    ):
+        """Follow changes to `naans` from a daemon thread, so it never blocks exit."""
+        threading.Thread(
+            target=self._keep_fresh,
+            args=(mdb, interval),
+            name="naan-registry",
+            daemon=True,
+        ).start()
+
+
+naan_registry = NaanRegistry()
@@ -0,0 +1,164 @@
+"""Immutable, on-disk snapshots of namespaces dated in closed months.
+
+Once its month has closed, a namespace and its terms can no longer change (see
+`main.check_too_late`), so each is rendered once per format and served from disk.
+
+Rendered bodies are content-addressed: `<directory>/objects/<sha256>`, written
+once and never modified, so workers publishing concurrently cannot clash. Each
+namespace has a manifest, `<directory>/namespaces/<sha256 of its @id>.json`, that
+records the revision it was rendered from and, for the namespace and for each of
+its terms, the object holding each media type.
+
+One worker at a time publishes, holding the "snapshots" lease (see
+`db.acquire_lease`); the others only read manifests.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from xyz_polyneme_ns.util import REPO_ROOT_DIR
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+SNAPSHOT_PUBLISH_SECONDS = int(os.getenv("SNAPSHOT_PUBLISH_SECONDS") or 3600)
+# How long a publishing worker may go without renewing its lease (it does so
+# after each namespace) before others assume it died.
+SNAPSHOT_PUBLISH_LEASE_SECONDS = float(
+    os.getenv("SNAPSHOT_PUBLISH_LEASE_SECONDS") or 600
+)
+
+SNAPSHOT_MEDIA_TYPES = (
+    "text/turtle",
+    "application/ld+json",
+    "application/n-triples",
+    "application/rdf+xml",
+    "text/html",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _write(path: Path, content: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def entry_doc(entry: dict) -> dict:
+    """The `@id` and revision fields of a manifest entry, as stored in Mongo."""
+    doc = {"@id": entry["@id"], "_v": entry["_v"]}
+    if entry.get("_modified") is not None:
+        doc["_modified"] = datetime.fromisoformat(entry["_modified"])
+    return doc
+
+
+def _entry(doc: dict, render: Callable[[str], Optional[bytes]], put_object) -> dict:
+    artifacts = {}
+    for media_type in SNAPSHOT_MEDIA_TYPES:
+        content = render(media_type)
+        if content is not None:
+            artifacts[media_type] = put_object(content)
+    modified = doc.get("_modified")
+    return {
+        "@id": doc["@id"],
+        "_v": doc.get("_v", 0),
+        "_modified": modified and modified.isoformat(),
+        "artifacts": artifacts,
+    }
+
+
+class SnapshotStore:
+    def __init__(self, directory: Union[Path, str]):
+        self.directory = Path(directory)
+        # ns @id -> (manifest file mtime, manifest)
+        self._manifests: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def object_path(self, sha256: str) -> Path:
+        return self.directory.joinpath("objects", sha256)
+
+    def _manifest_path(self, ns_uri: str) -> Path:
+        return self.directory.joinpath("namespaces", f"{_sha256(ns_uri.encode())}.json")
+
+    def put_object(self, content: bytes) -> str:
+        sha256 = _sha256(content)
+        path = self.object_path(sha256)
+        if not path.exists():
+            _write(path, content)
+        return sha256
+
+    def manifest(self, ns_uri: str) -> Optional[dict]:
+        """The published manifest for namespace `ns_uri`, or None if there is none.
+
+        Costs a `stat` per call, so a manifest republished by another worker is
+        seen at once.
+        """
+        path = self._manifest_path(ns_uri)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._manifests.get(ns_uri)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        manifest = json.loads(path.read_bytes())
+        with self._lock:
+            self._manifests[ns_uri] = (mtime, manifest)
+        return manifest
+
+    def publish(
+        self,
+        ns_doc: dict,
+        term_docs: Iterable[dict],
+        render: Callable[[list, str], Optional[bytes]],
+    ) -> dict:
+        """Render `ns_doc` with its `term_docs`, and each term alone, and publish them.
+
+        `render(docs, media_type)` returns the body for `docs` in `media_type`, or
+        None if it cannot be rendered that way (e.g. HTML for a single term).
+        Objects are written before the manifest that refers to them.
+        """
+        term_docs = list(term_docs)
+        manifest = _entry(
+            ns_doc, lambda mt: render([ns_doc] + term_docs, mt), self.put_object
+        )
+        manifest["terms"] = {
+            d["@id"].rpartition("/")[2]: _entry(
+                d, lambda mt, d=d: render([d], mt), self.put_object
+            )
+            for d in term_docs
+        }
+        _write(
+            self._manifest_path(ns_doc["@id"]),
+            json.dumps(manifest, sort_keys=True).encode(),
+        )
+        return manifest
+
+
+async def keep_published(
+    publish: Callable[[], int], interval: float = SNAPSHOT_PUBLISH_SECONDS
+):
+    while True:
+        try:
+            n_published = await run_in_threadpool(publish)
+            if n_published:
+                logger.info(f"Published {n_published} namespace snapshots")
+        except Exception as e:
+            logger.warning(f"Could not publish namespace snapshots: {e}")
+        await asyncio.sleep(interval)
+
+
+snapshot_store = SnapshotStore(REPO_ROOT_DIR.joinpath(SNAPSHOT_DIR or "snapshots"))
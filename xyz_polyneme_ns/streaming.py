@@ -0,0 +1,55 @@
+"""Incremental serialization of namespaces, for line-oriented formats."""
+import json
+import os
+from typing import Iterable, Iterator, List
+
+from rdflib import Dataset, Graph, URIRef
+from toolz import partition_all
+
+from xyz_polyneme_ns.db import without_storage_fields
+from xyz_polyneme_ns.negotiation import NDJSON, Serialization
+
+NAMESPACE_STREAM_BATCH_SIZE = int(os.getenv("NAMESPACE_STREAM_BATCH_SIZE") or 500)
+
+STREAMABLE_MEDIA_TYPES = {
+    "application/n-triples",
+    "application/n-quads",
+    NDJSON.media_type,
+}
+
+
+def streamable(serialization: Serialization) -> bool:
+    return serialization.media_type in STREAMABLE_MEDIA_TYPES
+
+
+def _serialize_batch(
+    docs: List[dict], serialization: Serialization, graph_name: str
+) -> str:
+    if serialization == NDJSON:
+        return "".join(json.dumps(d) + "\n" for d in docs)
+    # One JSON-LD parse per batch: a top-level array of docs, each with its @context.
+    data = json.dumps(docs)
+    if serialization.media_type == "application/n-quads":
+        ds = Dataset()
+        ds.graph(URIRef(graph_name)).parse(data=data, format="json-ld")
+        return ds.serialize(format="nquads")
+    return Graph().parse(data=data, format="json-ld").serialize(format="nt")
+
+
+def stream_namespace(
+    ns_doc: dict,
+    term_docs: Iterable[dict],
+    serialization: Serialization,
+    batch_size: int = NAMESPACE_STREAM_BATCH_SIZE,
+) -> Iterator[str]:
+    """Serialize a namespace doc and its term docs `batch_size` docs at a time.
+
+    `term_docs` is consumed lazily (e.g. a pymongo cursor), so memory use doesn't
+    grow with the size of the namespace.
+    """
+    graph_name = ns_doc["@id"]
+    yield _serialize_batch([without_storage_fields(ns_doc)], serialization, graph_name)
+    for batch in partition_all(batch_size, term_docs):
+        yield _serialize_batch(
+            [without_storage_fields(d) for d in batch], serialization, graph_name
+        )
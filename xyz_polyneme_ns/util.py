@@ -1,3 +1,4 @@
+import json
 import os
 import secrets
 
@@ -8,9 +9,11 @@ from fastapi import HTTPException
 
 from pathlib import Path
 from starlette import status
+from starlette.requests import Request
 from starlette.convertors import Convertor, register_url_convertor
 
 from toolz import keyfilter
+from typing import List
 
 PKG_ROOT_DIR = Path(__file__).parent
 REPO_ROOT_DIR = PKG_ROOT_DIR.parent
@@ -88,3 +91,38 @@ def register_prefixed_path_url_converter(prefix: str):
             return str(value)
 
     register_url_convertor(f"prefixed_path_{prefix}", PrefixedPathConverter())
+
+
+def _raise_unprocessable(detail):
+    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+async def read_json_docs(request: Request, max_docs: int) -> List[dict]:
+    """JSON objects from a request body that is either a JSON array or NDJSON.
+
+    NDJSON (`Content-Type: application/x-ndjson`) is parsed line by line as it is
+    received. Raises a 413 if the body holds more than `max_docs` docs.
+    """
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            docs, buffer = [], b""
+            async for chunk in request.stream():
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                docs.extend(json.loads(line) for line in lines if line.strip())
+                if len(docs) > max_docs:
+                    break
+            if buffer.strip():
+                docs.append(json.loads(buffer))
+        else:
+            docs = await request.json()
+    except ValueError as e:  # incl. a body that isn't UTF-8
+        _raise_unprocessable(f"Invalid JSON: {e}")
+    if not isinstance(docs, list) or not all(isinstance(d, dict) for d in docs):
+        _raise_unprocessable("Expected a JSON array (or NDJSON) of JSON objects.")
+    if len(docs) > max_docs:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {max_docs} docs per request.",
+        )
+    return docs
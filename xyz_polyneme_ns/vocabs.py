@@ -0,0 +1,52 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+import rdflib
+from rdflib import RDFS
+
+from xyz_polyneme_ns.util import REPO_ROOT_DIR
+
+AGU_INDEX_TERMS_FILE = REPO_ROOT_DIR.joinpath("agu_index_terms.ttl")
+AGU_CODE_PREFIX = "CODE: "
+
+
+class AguIndex(NamedTuple):
+    graph: rdflib.Graph
+    terms: Dict[str, Tuple[tuple, ...]]
+    mtime: float
+
+
+@lru_cache(maxsize=1)
+def _load_agu_index(filename: str, mtime: float) -> AguIndex:
+    g = rdflib.Graph()
+    g.parse(filename, format="turtle")
+    terms = {}
+    for s, o in g.subject_objects(predicate=RDFS.comment):
+        comment = str(o)
+        if comment.startswith(AGU_CODE_PREFIX):
+            code = comment[len(AGU_CODE_PREFIX) :]
+            terms[code] = tuple(g.triples((s, None, None)))
+    return AguIndex(graph=g, terms=terms, mtime=mtime)
+
+
+def agu_index(filename: Union[Path, str] = AGU_INDEX_TERMS_FILE) -> AguIndex:
+    """Parsed AGU index terms, with each term's triples keyed by its code.
+
+    Parsed once and re-parsed only when the file's mtime changes.
+    """
+    filename = str(filename)
+    return _load_agu_index(filename, os.stat(filename).st_mtime)
+
+
+def agu_term_graph(
+    code: str, index: Optional[AguIndex] = None
+) -> Optional[rdflib.Graph]:
+    triples = (index or agu_index()).terms.get(code)
+    if triples is None:
+        return None
+    g = rdflib.Graph()
+    for triple in triples:
+        g.add(triple)
+    return g